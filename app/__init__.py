@@ -2,11 +2,66 @@ import os
 import sys
 import yaml
 import re
+import json
+import hashlib
 import logging
 from typing import Any, Dict, List, Optional, Pattern, Tuple
 
+from .autoinst_parser import PARSED_LOG_VERSION, ChannelMatcher
 
-def load_configuration(app_logger: logging.Logger) -> Tuple[str, Optional[int], List[Dict[str, Any]], Pattern[str], Pattern[str], int]:
+
+def _config_sidecar_path(config_file: str) -> str:
+    """
+    Returns the path of the sidecar file holding the already parsed content
+    of the configuration file, stored pyc-style in a __pycache__ folder
+    next to it.
+    """
+    config_dir, config_name = os.path.split(os.path.abspath(config_file))
+    return os.path.join(config_dir, "__pycache__", f"{config_name}.json")
+
+
+def _read_config_sidecar(sidecar: str, key: List[Any]) -> Optional[Dict[str, Any]]:
+    """
+    Returns the parsed configuration stored in the sidecar file, or None
+    if the sidecar is missing, corrupted or does not match the given key.
+    """
+    try:
+        with open(sidecar, "r") as f:
+            cached = json.load(f)
+    except (IOError, ValueError):
+        return None
+    if not isinstance(cached, dict) or cached.get("key") != key:
+        return None
+    return cached.get("config")
+
+
+def _write_config_sidecar(sidecar: str, key: List[Any], config: Any) -> None:
+    """
+    Stores the parsed configuration in the sidecar file. Failures are not
+    fatal: the configuration file is simply parsed again on next startup.
+    A configuration that JSON cannot represent as is (dates, non-string
+    keys) is not stored.
+    """
+    tmp_sidecar = f"{sidecar}.{os.getpid()}.tmp"
+    try:
+        content = {"key": key, "config": config}
+        serialized = json.dumps(content)
+        if json.loads(serialized) != content:
+            return
+        os.makedirs(os.path.dirname(sidecar), exist_ok=True)
+        with open(tmp_sidecar, "w") as f:
+            f.write(serialized)
+        os.replace(tmp_sidecar, sidecar)
+    except (IOError, TypeError, ValueError):
+        try:
+            os.remove(tmp_sidecar)
+        except OSError:
+            pass
+
+
+def load_configuration(
+    app_logger: logging.Logger,
+) -> Tuple[str, Optional[int], List[Dict[str, Any]], Pattern[str], Pattern[str], int]:
     """
     Loads configuration from YAML file, pre-compiles regexes, and returns
     key configuration variables.
@@ -26,8 +81,30 @@ def load_configuration(app_logger: logging.Logger) -> Tuple[str, Optional[int],
     # Load configuration from YAML file
     CONFIG_FILE = os.environ.get("OQTV_CONFIG_FILE", "config.yaml")
     try:
-        with open(CONFIG_FILE, "r") as f:
-            config = yaml.safe_load(f)
+        # The YAML parsing result is cached in a sidecar file keyed by the
+        # config file mtime, size and content hash, so that following startups
+        # (e.g. Flask reloader, multiple workers) can skip the YAML parsing.
+        # The hash catches a file replaced keeping its size and mtime
+        # (e.g. 'cp -p'), and costs little next to the parsing.
+        # JSON is used as it is safe to load and its C decoder is much faster
+        # than the YAML one.
+        with open(CONFIG_FILE, "rb") as f:
+            config_stat = os.fstat(f.fileno())
+            config_data = f.read()
+        sidecar_key = [
+            config_stat.st_mtime_ns,
+            config_stat.st_size,
+            hashlib.sha256(config_data).hexdigest(),
+        ]
+        sidecar = _config_sidecar_path(CONFIG_FILE)
+        config = _read_config_sidecar(sidecar, sidecar_key)
+        if config is None:
+            # Prefer the libyaml based loader, fall back to the pure Python one
+            # when PyYAML has been built without libyaml. The file is read as
+            # bytes, the loader detects and decodes the encoding itself.
+            Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+            config = yaml.load(config_data, Loader=Loader)
+            _write_config_sidecar(sidecar, sidecar_key, config)
     except (IOError, yaml.YAMLError) as e:
         app_logger.error(f"Error loading configuration file {CONFIG_FILE}: {e}")
         sys.exit(1)
@@ -88,8 +165,33 @@ def load_configuration(app_logger: logging.Logger) -> Tuple[str, Optional[int],
 
                 sys.exit(1)
 
-    timestamp_re = re.compile(r"^\[([^\]]+)\]")
-    perl_exception_re = re.compile(r" at .*?\.pm line \d+")
+        # Combine all the channel patterns once, not at each parsing
+        parser["channel_matcher"] = ChannelMatcher(parser.get("channels", []))
+
+    # Matches a whole timestamped line, used to scan the full log at once.
+    # The '\r' of the logs with CRLF line breaks is not part of the line.
+    timestamp_re = re.compile(
+        r"^\[(?P<timestamp>[^\]\n]+)\](?P<message>[^\r\n]*)", re.MULTILINE
+    )
+    perl_exception_re = re.compile(r" at [^ \n]*\.pm line \d+")
+
+    # Identifies everything the result of parsing a log depends on,
+    # the parsed logs in the cache are only used with the same key.
+    for parser in autoinst_log_parsers:
+        parser_key = {
+            "version": PARSED_LOG_VERSION,
+            # Stored in the parsed log as 'parser_name'
+            "name": parser["name"],
+            "timestamp": timestamp_re.pattern,
+            "exception": perl_exception_re.pattern,
+            "channels": [
+                [channel["name"], channel.get("type"), channel["pattern"].pattern]
+                for channel in parser.get("channels", [])
+            ],
+        }
+        parser["cache_key"] = hashlib.sha256(
+            json.dumps(parser_key, sort_keys=True).encode("utf-8")
+        ).hexdigest()
 
     return (
         CACHE_DIR,
@@ -1,7 +1,318 @@
+import heapq
+import re
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Pattern, Tuple
+from functools import lru_cache
+from operator import itemgetter
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Match,
+    Optional,
+    Pattern,
+    Tuple,
+    cast,
+)
 
+# Matches the named groups definitions '(?P<name>' and back references '(?P=name)'
+_GROUP_NAME_RE = re.compile(r"\(\?P([<=])(\w+)")
+# Matches numbered back references '\1' and conditional groups '(?(1)', which
+# would refer to other groups once the pattern is combined with the others.
+# It can also match an escaped backslash followed by a digit: such patterns
+# are then just not combined.
+_GROUP_REFERENCE_RE = re.compile(r"\\[1-9]|\(\?\(")
+# Matches global inline flags at the beginning of a pattern, e.g. '(?i)'
+_GLOBAL_FLAGS_RE = re.compile(r"^\(\?[aiLmsux]+\)")
+# Matches a leading '.*' or '.*?', that does not change if a pattern
+# is found or not in a line but makes search() quadratic.
+_LEADING_WILDCARD_RE = re.compile(r"^\.\*\??(?![*+?{])")
+_FLAG_LETTERS = (
+    (re.ASCII, "a"),
+    (re.IGNORECASE, "i"),
+    (re.MULTILINE, "m"),
+    (re.DOTALL, "s"),
+    (re.VERBOSE, "x"),
+)
+# Version of the parse_autoinst_log output format, part of the key of the
+# parsed logs stored in the cache: increase it when the output changes.
+PARSED_LOG_VERSION = 1
+# Shorter literals would make too many lines candidate to a match
+_MIN_LITERAL_LENGTH = 3
+# Number of hexadecimal digits following the '\x', '\u' and '\U' escapes
+_ESCAPE_ARGUMENT_LENGTHS = {"x": 2, "u": 4, "U": 8}
+# Matches a '{m,n}' repetition, a '{' not starting one is a literal
+_REPETITION_RE = re.compile(r"\{\d*(?:,\d*)?\}")
 
+
+@lru_cache(maxsize=256)
+def _required_literal(pattern: Pattern[str]) -> Optional[str]:
+    """
+    Returns the longest literal text that every match of the pattern
+    contains, or None if it cannot be determined.
+
+    The pattern source is read conservatively: only the literal characters
+    outside of any group or character class are considered, and patterns
+    with alternatives or case insensitive are not handled.
+    """
+    if pattern.flags & re.IGNORECASE:
+        return None
+    verbose = pattern.flags & re.VERBOSE
+    source = pattern.pattern
+    runs: List[str] = []
+    run: List[str] = []
+    # Whether the last item read is the last character of run
+    after_literal = False
+    depth = 0
+    index = 0
+    while index < len(source):
+        char = source[index]
+        index += 1
+        if verbose and char.isspace():
+            continue
+        if verbose and char == "#":
+            # A comment, up to the end of the line
+            index = source.find("\n", index)
+            if index == -1:
+                break
+            continue
+        if char == "[":
+            # Skip the character class, a ']' at its start is a literal
+            if source.startswith("^", index):
+                index += 1
+            if source.startswith("]", index):
+                index += 1
+            while index < len(source) and source[index] != "]":
+                index += 2 if source[index] == "\\" else 1
+            index += 1
+            char = ""
+        elif char == "\\":
+            char = source[index : index + 1]
+            index += 1
+            if char.isalnum():
+                # A character class, an anchor or a special character,
+                # skip the arguments of the escapes having some.
+                if char in _ESCAPE_ARGUMENT_LENGTHS:
+                    index += _ESCAPE_ARGUMENT_LENGTHS[char]
+                elif char == "N" and source.startswith("{", index):
+                    index = source.find("}", index) + 1 or len(source)
+                elif char.isdigit():
+                    # Octal escape or numbered back reference
+                    while index < len(source) and source[index].isdigit():
+                        index += 1
+                char = ""
+        elif char == "(":
+            depth += 1
+            char = ""
+        elif char == ")":
+            depth -= 1
+            char = ""
+        elif depth:
+            continue
+        elif char == "|":
+            return None
+        elif char in "*+?{":
+            repetition = _REPETITION_RE.match(source, index - 1)
+            if char != "{" or repetition:
+                if repetition:
+                    index = repetition.end()
+                # The item before is optional or repeated
+                if after_literal:
+                    run.pop()
+                char = ""
+        elif char in ".^$":
+            char = ""
+        if depth or not char:
+            runs.append("".join(run))
+            run.clear()
+            after_literal = False
+        else:
+            run.append(char)
+            after_literal = True
+    runs.append("".join(run))
+    return max(runs, key=len) or None
+
+
+def _lines_containing(text: str, literal: str) -> Iterator[int]:
+    """Yields, in order, the start offset of the lines of text containing literal."""
+    position = text.find(literal)
+    while position != -1:
+        yield text.rfind("\n", 0, position) + 1
+        line_end = text.find("\n", position)
+        if line_end == -1:
+            return
+        position = text.find(literal, line_end)
+
+
+def _line_starts(text: str) -> Iterator[int]:
+    """Yields the start offset of all the lines of text."""
+    position = 0
+    while position < len(text):
+        yield position
+        position = text.find("\n", position) + 1
+        if position == 0:
+            return
+
+
+class ChannelMatcher:
+    """Finds the first channel, in the configuration order, matching a log line.
+
+    Instead of calling search() for each channel on each line, all the channel
+    patterns are combined in a single alternation, so that the vast majority
+    of the lines, not matching any channel, are rejected by a single regex call.
+
+    To keep the regex engine literal prefix optimization, each branch starts
+    with the channel pattern itself (without any leading '.*'); an empty marker
+    group at the end of each branch tells which channel matched.
+    The combined regex returns the leftmost match in the line, while the
+    configuration semantic is "first matching channel wins": when a line
+    matches, the channels defined before the one found are checked again
+    one by one. This only happens for the few matching lines.
+    The groups of the matching channel are then extracted with the channel
+    own pattern, so the returned match object is the one that a per channel
+    search() would have returned.
+    The channels with numbered back references or conditional groups cannot
+    be combined, as their group numbers would change: they are left out of
+    the combined regex and searched one by one on each line.
+    """
+
+    def __init__(self, channels: List[Dict[str, Any]]) -> None:
+        """
+        Args:
+            channels: A list of channel objects from the config file,
+                      with pre-compiled regex patterns.
+
+        The combined regex is only compiled on the first call to match(),
+        parsers never used for any job do not pay for it.
+        """
+        self.channels: List[Dict[str, Any]] = [
+            channel for channel in channels if channel.get("pattern")
+        ]
+        self._probes: List[Pattern[str]] = []
+        # Indexes of the channels left out of the combined regex
+        self._standalone: List[int] = []
+        self._combined_re: Optional[Pattern[str]] = None
+        self._literals: Optional[List[str]] = None
+        self._dispatch: Optional[Dict[int, int]] = None
+
+    def _compile(self) -> Dict[int, int]:
+        """Builds and compiles the combined regex, returns the dispatch table."""
+        probes = []
+        standalone = []
+        branches = []
+        for index, channel in enumerate(self.channels):
+            pattern = channel["pattern"]
+            source = _LEADING_WILDCARD_RE.sub("", pattern.pattern)
+            if source != pattern.pattern:
+                probes.append(re.compile(source, pattern.flags))
+            else:
+                probes.append(pattern)
+            if _GROUP_REFERENCE_RE.search(source):
+                standalone.append(index)
+                continue
+            # Group names has to be unique in the combined pattern.
+            source = _GROUP_NAME_RE.sub(rf"(?P\1__ch{index}_\2", source)
+            # Global flags are only allowed at the start of the whole
+            # expression, turn them in flags scoped to this branch.
+            flags = "".join(
+                letter for flag, letter in _FLAG_LETTERS if pattern.flags & flag
+            )
+            if flags:
+                source = _GLOBAL_FLAGS_RE.sub("", source)
+                # In verbose mode a trailing comment would swallow the closing
+                # parenthesis, terminate it with a new line.
+                if pattern.flags & re.VERBOSE:
+                    source += "\n"
+                source = f"(?{flags}:{source})"
+            branches.append(f"(?:{source})(?P<__ch{index}>)")
+
+        dispatch: Dict[int, int] = {}
+        if branches:
+            combined_re = re.compile("|".join(branches))
+            dispatch = {
+                group: int(name[4:])
+                for name, group in combined_re.groupindex.items()
+                if name.startswith("__ch") and name[4:].isdigit()
+            }
+            self._combined_re = combined_re
+        self._probes = probes
+        self._standalone = standalone
+        self._literals = self._channel_literals()
+        # Set last: the matcher is only used once it is complete.
+        self._dispatch = dispatch
+        return dispatch
+
+    def _channel_literals(self) -> Optional[List[str]]:
+        """
+        Returns the minimal list of literals such that any line matching
+        a channel contains one of them, or None if there is none.
+        """
+        literals = set()
+        for channel in self.channels:
+            literal = _required_literal(channel["pattern"])
+            if literal is None or len(literal) < _MIN_LITERAL_LENGTH:
+                return None
+            literals.add(literal)
+        # A line containing 'mutex lock' also contains 'mutex'
+        return sorted(
+            literal
+            for literal in literals
+            if not any(other != literal and other in literal for other in literals)
+        )
+
+    def candidate_lines(self, text: str) -> Optional[List[int]]:
+        """
+        Returns the sorted start offsets of the lines of text that can match
+        a channel, found with plain substring searches for the literal text
+        each channel requires. Returns None if some channel does not require
+        any literal text: then every line has to be checked.
+        """
+        if self._dispatch is None:
+            self._compile()
+        if self._literals is None:
+            return None
+        starts: set[int] = set()
+        for literal in self._literals:
+            starts.update(_lines_containing(text, literal))
+        return sorted(starts)
+
+    def match(self, line: str) -> Optional[Tuple[Dict[str, Any], Match[str]]]:
+        """
+        Returns the first channel matching the line and its match object,
+        or None if no channel matches.
+        """
+        dispatch = self._dispatch
+        if dispatch is None:
+            dispatch = self._compile()
+        hit = None
+        if self._combined_re is not None:
+            hit = self._combined_re.search(line)
+        indexes: Iterable[int]
+        if hit is None:
+            # Only the channels left out of the combined regex can match
+            if not self._standalone:
+                return None
+            indexes = self._standalone
+            found = 0
+        else:
+            # The marker group closing the branch is always the last matched group.
+            found = dispatch[cast(int, hit.lastindex)]
+            # A channel defined before the one found can still match later in
+            # the line. If the one found does not match on its own, the
+            # following ones are tried.
+            indexes = range(len(self.channels))
+        for index in indexes:
+            if index < found and not self._probes[index].search(line):
+                continue
+            channel = self.channels[index]
+            search_match = channel["pattern"].search(line)
+            if search_match is not None:
+                return channel, search_match
+        return None
+
+
+@lru_cache(maxsize=256)
 def _create_exception_timestamp(timestamp_str: str | None) -> str | None:
     """
     Takes the last known timestamp, adds a small offset, and returns a new
@@ -9,6 +320,8 @@ def _create_exception_timestamp(timestamp_str: str | None) -> str | None:
     multi-line exceptions that don't have their own timestamp.
 
     Returns None if the input timestamp is invalid or missing.
+    The result is memoized, as consecutive exception blocks often follow
+    the same timestamped line.
     """
     if not timestamp_str:
         return None
@@ -21,11 +334,88 @@ def _create_exception_timestamp(timestamp_str: str | None) -> str | None:
     return new_dt_object.isoformat().replace("+00:00", "Z")
 
 
+def _parse_exception_block(
+    block: str,
+    last_timestamp: str | None,
+    perl_exception_re: Pattern[str],
+    exception_literal: Optional[str] = None,
+) -> Dict[str, Any] | None:
+    """
+    Checks if a block of consecutive lines without a timestamp is a
+    Perl exception.
+
+    Args:
+        block: The text between two timestamped lines.
+        last_timestamp: The timestamp of the last timestamped line before the block.
+        perl_exception_re: Compiled regex for parsing Perl exceptions.
+        exception_literal: Text every match of perl_exception_re contains,
+                           if known.
+
+    Returns:
+        The exception log entry, or None if the block is not an exception.
+    """
+    # Cheap substring test first: most of the blocks are not exceptions
+    # and can be discarded without running the regex.
+    if exception_literal is not None and exception_literal not in block:
+        return None
+    exception_buffer = [line for line in block.splitlines() if line.strip()]
+    if not exception_buffer:
+        return None
+    full_buffer_text = "\n".join(exception_buffer)
+    if not perl_exception_re.search(full_buffer_text):
+        return None
+    # Assign a timestamp slightly after the last known event
+    # to position the exception correctly on the timeline.
+    return {
+        "timestamp": _create_exception_timestamp(last_timestamp),
+        "message": full_buffer_text,
+        "type": "exception",
+    }
+
+
+def _timestamped_lines(
+    log_content: str, line_starts: List[int], timestamp_re: Pattern[str]
+) -> Iterator[Tuple[int, Optional[Match[str]]]]:
+    """Yields the position and the match of the given lines having a timestamp."""
+    for line_start in line_starts:
+        line_match = timestamp_re.match(log_content, line_start)
+        if line_match:
+            yield line_start, line_match
+
+
+def _exception_block_bounds(
+    log_content: str, position: int, timestamp_re: Pattern[str]
+) -> Tuple[int, int, Optional[str]]:
+    """
+    Finds the block of lines without a timestamp around the one at position.
+
+    Returns:
+        The start and end offsets of the block, and the timestamp of the
+        line before it (None at the beginning of the log).
+    """
+    block_start = 0
+    last_timestamp = None
+    line_start = position
+    while line_start > 0:
+        line_start = log_content.rfind("\n", 0, line_start - 1) + 1
+        line_match = timestamp_re.match(log_content, line_start)
+        if line_match:
+            block_start = line_match.end()
+            last_timestamp = line_match.group("timestamp")
+            break
+    line_end = log_content.find("\n", position)
+    while line_end != -1 and not timestamp_re.match(log_content, line_end + 1):
+        line_end = log_content.find("\n", line_end + 1)
+    block_end = len(log_content) if line_end == -1 else line_end + 1
+    return block_start, block_end, last_timestamp
+
+
 def parse_autoinst_log(
     log_content: str,
     patterns: List[Dict[str, Any]],
     timestamp_re: Pattern[str],
     perl_exception_re: Pattern[str],
+    channel_matcher: Optional[ChannelMatcher] = None,
 ) -> Tuple[List[Dict[str, Any]], List[str], int, int]:
     """
     Parses the content of an autoinst-log.txt file to extract only the lines
@@ -36,8 +426,13 @@ def parse_autoinst_log(
         log_content: The full string content of the log file.
         patterns: A list of channel objects from the config file,
                   with pre-compiled regex patterns.
-        timestamp_re: Compiled regex for parsing timestamps.
+        timestamp_re: Compiled multi-line regex matching a whole timestamped
+                      line without its line break, with 'timestamp' and
+                      'message' named groups.
         perl_exception_re: Compiled regex for parsing Perl exceptions.
+        channel_matcher: Optional ChannelMatcher already built for the
+                         patterns at configuration load time.
+                         If missing, a new one is built for this call.
 
     Returns:
         A tuple containing:
@@ -47,71 +442,84 @@ def parse_autoinst_log(
         - The total number of lines processed from the log content.
         - The total number of matched events (log lines or exceptions) found.
     """
+    if channel_matcher is None:
+        channel_matcher = ChannelMatcher(patterns)
     parsed_log = []
-    optional_columns = set()
-    lines = log_content.splitlines()
-    line_count = len(lines)
+    optional_columns: set[str] = set()
+    line_count = log_content.count("\n")
+    if log_content and not log_content.endswith("\n"):
+        line_count += 1
     match_count = 0
-    i = 0
-    last_timestamp = None
-    while i < len(lines):
-        try:
-            line = lines[i]
-            timestamp_match = timestamp_re.match(line)
-
-            if timestamp_match:
-                # This is a standard, timestamped line.
-                timestamp = timestamp_match.group(1)
-                last_timestamp = timestamp
-                # Process it against configured patterns.
-                for channel in patterns:
-                    pattern = channel.get("pattern")
-                    if not pattern:
-                        continue
-
-                    search_match = pattern.search(line)
-                    if search_match:
-                        message = line[len(timestamp_match.group(0)) :].strip()
-                        log_entry = {
-                            "timestamp": timestamp,
-                            "message": message,
-                            "type": channel["type"],
-                            "event_name": channel["name"],
-                        }
-                        group_dict = search_match.groupdict()
-                        log_entry.update(group_dict)
-                        optional_columns.update(group_dict.keys())
-                        parsed_log.append(log_entry)
-                        match_count += 1
-                        break  # Found a match, go to the next line
-                i += 1
-            else:
-                # This line has no timestamp. It could be the start of an exception block.
-                # Collect all following consecutive lines without a timestamp.
-                exception_buffer = []
-                while i < len(lines) and not timestamp_re.match(lines[i]):
-                    if lines[i].strip():  # ignore empty lines
-                        exception_buffer.append(lines[i])
-                    i += 1
-
-                if exception_buffer:
-                    full_buffer_text = "\n".join(exception_buffer)
-                    if perl_exception_re.search(full_buffer_text):
-                        # Assign a timestamp slightly after the last known event
-                        # to position the exception correctly on the timeline.
-                        log_entry = {
-                            "timestamp": _create_exception_timestamp(last_timestamp),
-                            "message": full_buffer_text,
-                            "type": "exception",
-                        }
-                        parsed_log.append(log_entry)
-                        match_count += 1
-        except Exception as e:
-            # Add context to the exception and re-raise it.
-            # This will be caught by the `analyze` function's error handler.
-            line_content = lines[i] if i < len(lines) else "end of file"
-            raise Exception(
-                f"Log parsing failed at line {i + 1}: '{line_content}'"
-            ) from e
+    # End of the last exception block processed
+    block_end = 0
+    position = 0
+    try:
+        # Only the lines that can match a channel or be part of an exception
+        # are visited, found by the C substring search: in most logs they are
+        # a small fraction of all the lines.
+        line_starts = channel_matcher.candidate_lines(log_content)
+        if line_starts is None:
+            line_matches: Iterator[Tuple[int, Optional[Match[str]]]] = (
+                (line_match.start(), line_match)
+                for line_match in timestamp_re.finditer(log_content)
+            )
+        else:
+            line_matches = _timestamped_lines(log_content, line_starts, timestamp_re)
+        # An exception block has a line containing the literal text
+        # required by perl_exception_re, without it all the lines are visited.
+        exception_literal = _required_literal(perl_exception_re)
+        if exception_literal is None:
+            exception_starts: Iterator[int] = _line_starts(log_content)
+        else:
+            exception_starts = _lines_containing(log_content, exception_literal)
+        exception_lines = ((line_start, None) for line_start in exception_starts)
+        for position, line_match in heapq.merge(
+            line_matches, exception_lines, key=itemgetter(0)
+        ):
+            if line_match is None:
+                # Lines without a timestamp are processed as a whole block.
+                if position < block_end or timestamp_re.match(log_content, position):
+                    continue
+                block_start, block_end, last_timestamp = _exception_block_bounds(
+                    log_content, position, timestamp_re
+                )
+                log_entry = _parse_exception_block(
+                    log_content[block_start:block_end],
+                    last_timestamp,
+                    perl_exception_re,
+                    exception_literal,
+                )
+                if log_entry:
+                    parsed_log.append(log_entry)
+                    match_count += 1
+                continue
+
+            # This is a standard, timestamped line.
+            # Process it against all the configured patterns at once.
+            line = line_match.group(0)
+            channel_match = channel_matcher.match(line)
+            if channel_match:
+                channel, search_match = channel_match
+                message = line_match.group("message").strip()
+                log_entry = {
+                    "timestamp": line_match.group("timestamp"),
+                    "message": message,
+                    "type": channel["type"],
+                    "event_name": channel["name"],
+                }
+                group_dict = search_match.groupdict()
+                log_entry.update(group_dict)
+                optional_columns.update(group_dict.keys())
+                parsed_log.append(log_entry)
+                match_count += 1
+    except Exception as e:
+        # Add context to the exception and re-raise it.
+        # This will be caught by the `analyze` function's error handler.
+        line_number = log_content.count("\n", 0, position) + 1
+        line_end = log_content.find("\n", position)
+        line_content = log_content[position : line_end if line_end >= 0 else None]
+        raise Exception(
+            f"Log parsing failed at line {line_number}: '{line_content}'"
+        ) from e
 
     return parsed_log, sorted(list(optional_columns)), line_count, match_count
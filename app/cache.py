@@ -1,6 +1,49 @@
 import os
 import logging
 import json
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import IO, Any, Iterator
+
+try:
+    # orjson is much faster than the standard json module on the big
+    # log strings stored in the cache, use json only as a fallback.
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore[assignment]
+
+try:
+    # Logs are very repetitive text: stored compressed they take
+    # a fraction of the disk space and are read back faster.
+    import zstandard
+    from zstandard import ZstdError
+except ImportError:  # pragma: no cover
+    zstandard = None  # type: ignore[assignment]
+    # Never raised without zstandard, keeps the except clauses valid
+    ZstdError = OSError  # type: ignore[assignment,misc]
+
+ZSTD_LEVEL = 3
+# Name of the index database, at the root of the cache directory
+INDEX_FILE = "index.db"
+# Extensions of all the files making a cache entry
+ENTRY_EXTENSIONS = (".json", ".log", ".log.zst", ".parsed.json")
+
+
+def _json_loads(data: bytes) -> Any:
+    """Deserializes JSON from bytes, using orjson when available."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _json_dumps(obj: Any) -> bytes:
+    """Serializes an object to JSON bytes, using orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode("utf-8")
 
 
 class openQACache:
@@ -20,41 +63,64 @@ class openQACache:
       A main cache directory (configurable by `cache_dir` in `config.yaml`)
       contains subdirectories for each openQA server hostname.
       Inside each hostname directory, cached data for a specific job is stored
-      in a JSON file named after the job ID (e.g., `.cache/openqa.suse.de/12345.json`).
+      in two files named after the job ID: a small JSON file with the job
+      details (e.g., `.cache/openqa.suse.de/12345.json`) and the log file
+      compressed with zstd (e.g., `.cache/openqa.suse.de/12345.log.zst`).
 
-    - **Data Format:** Each cache file is a JSON object containing two main keys:
+    - **Data Format:** The JSON file contains a JSON object with the key:
       - `job_details`: A dictionary holding the complete JSON response for a job's
         details from the openQA API.
-      - `log_content`: A string containing the full content of the
-        `autoinst-log.txt` for that job.
+      The log file contains the full content of the `autoinst-log.txt`
+      for that job, as downloaded. Keeping it separated allows to read the
+      job details without loading the log, and to read the log without
+      any JSON parsing. The log is downloaded uncompressed to `<id>.log`
+      and compressed when the cache entry is completed; if the zstandard
+      module is not available it is kept uncompressed.
+      Cache files written by older versions have no log file: the log is
+      stored in the JSON file, under a `log_content` key. They are still read.
+      Once the log is parsed, the result is stored in a third file
+      (e.g., `.cache/openqa.suse.de/12345.parsed.json`) together with the
+      key of the parser configuration used.
 
     Workflow
     --------
     The caching logic is integrated into the main application flow in `app/main.py`:
 
     1.  **Job Discovery (`discover_jobs`):** When discovering related jobs, the
-        application first checks if a cache file exists for a given job ID using
-        `cache.hit()`. If it does, `cache.get_data()` is called to retrieve the
-        `job_details`, and the API call to the openQA server is skipped.
+        application calls `cache.get_data()` to retrieve the `job_details`
+        of a given job ID. If they are found, the API call to the openQA
+        server is skipped.
 
     2.  **Log Processing (`process_job_logs`):** Before attempting to download a
-        log file, the application calls `cache.get_log_content()`. If the log is
-        found in the cache, the download is skipped.
+        log file, the application calls `cache.get_parsed_log()`. If the log
+        has already been parsed with the same parser configuration, the result
+        is used as is. Otherwise it calls `cache.get_log_content()`: if the log
+        is found in the cache, the download is skipped. The parsing result is
+        then saved with `cache.write_parsed_log()`.
 
-    3.  **Cache Writing (`_get_log_from_api`):** A cache file is written only after
-        job data and its corresponding log file have been successfully downloaded
-        from the openQA API. The `cache.write_data()` method is called to save
-        both the `job_details` and `log_content` into a single JSON file.
+    3.  **Cache Writing (`_get_log_from_api`):** The log file is downloaded
+        directly to its cache path, `cache.log_path()`. The JSON file is written
+        only after it has been successfully downloaded from the openQA API:
+        the `cache.write_data()` method is called to save the `job_details`.
+        As the JSON file is always written last, `cache.hit()` only checks it.
 
     Configuration and Invalidation
     ------------------------------
     - The cache directory and maximum size are configured in the `config.yaml` file.
     - As only completed jobs are considered, the cache never become
       invalid or obsolete. Job details or log files are not supposed to change
-      in the openQA server for such jobs.
+      in the openQA server for such jobs. A parsed log is ignored if the
+      parser configuration changed since it was written.
     - The cache is persistent and does not have an automatic expiration or TTL
       (Time To Live) mechanism. It can be manually cleared by deleting the cache
       directory.
+    - An SQLite index (`index.db` in the cache directory) records the size and
+      the last access time of each cache entry, for all the hostnames.
+      The access times are written all at once, at the next write to the
+      index or when the cache is closed with `close()` at the end of a request.
+      When `cache_max_size` is set and a new entry makes the cache exceed it,
+      the least recently used entries are removed.
+      The index is built from the existing files on first use.
     - The application provides an `ignore_cache` option in the `/analyze` API
       endpoint to bypass the cache and force a fresh download of all data.
     """
@@ -68,38 +134,224 @@ class openQACache:
         self.max_size = max_size
         self.logger = logger
         os.makedirs(self.cache_host_dir, exist_ok=True)
+        self._index_lock = threading.Lock()
+        # Entries written with this instance, never evicted by it: they
+        # are still to be read back by the request using the instance.
+        self._written: set[str] = set()
+        # Access times of the entries read, written to the index in a single
+        # transaction with the next index update or by close().
+        self._touched: dict[str, float] = {}
+        self._index = self._open_index()
+
+    def _open_index(self) -> sqlite3.Connection | None:
+        """
+        Opens the index database, creating and filling it from the files
+        already in the cache if needed.
+        Returns None if the index cannot be used: the cache still works,
+        without size limit.
+        """
+        index_path = os.path.join(self.cache_path, INDEX_FILE)
+        try:
+            index = sqlite3.connect(index_path, timeout=10, check_same_thread=False)
+            with index:
+                index.execute(
+                    "CREATE TABLE IF NOT EXISTS entries ("
+                    "hostname TEXT NOT NULL, job_id TEXT NOT NULL, "
+                    "size INTEGER NOT NULL, atime REAL NOT NULL, "
+                    "PRIMARY KEY (hostname, job_id))"
+                )
+                if index.execute("PRAGMA user_version").fetchone()[0] == 0:
+                    self._fill_index(index)
+                    index.execute("PRAGMA user_version = 1")
+            return index
+        except (sqlite3.Error, OSError) as e:
+            self.logger.error(f"Failed to open cache index {index_path}: {e}")
+            return None
+
+    def _fill_index(self, index: sqlite3.Connection) -> None:
+        """Adds to the index the entries of a cache written without it."""
+        entries: dict[tuple[str, str], list[float]] = {}
+        for hostname in os.listdir(self.cache_path):
+            host_dir = os.path.join(self.cache_path, hostname)
+            if not os.path.isdir(host_dir):
+                continue
+            for filename in os.listdir(host_dir):
+                job_id, dot, extension = filename.partition(".")
+                if not dot or f".{extension}" not in ENTRY_EXTENSIONS:
+                    continue
+                stat = os.stat(os.path.join(host_dir, filename))
+                size_atime = entries.setdefault((hostname, job_id), [0, 0.0])
+                size_atime[0] += stat.st_size
+                size_atime[1] = max(size_atime[1], stat.st_mtime)
+        index.executemany(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+            [(h, j, int(size), atime) for (h, j), (size, atime) in entries.items()],
+        )
+
+    def _entry_size(self, job_id) -> int:
+        """Returns the disk size of all the files of a cache entry."""
+        size = 0
+        for extension in ENTRY_EXTENSIONS:
+            try:
+                size += os.path.getsize(
+                    os.path.join(self.cache_host_dir, f"{job_id}{extension}")
+                )
+            except OSError:
+                pass
+        return size
+
+    def _touch(self, job_id) -> None:
+        """Marks a cache entry as recently used."""
+        if self._index is None:
+            return
+        with self._index_lock:
+            self._touched[job_id] = time.time()
+
+    def _write_touched(self) -> None:
+        """
+        Writes the pending access times to the index. To be called with the
+        index lock held, within a transaction.
+        """
+        assert self._index is not None
+        if not self._touched:
+            return
+        self._index.executemany(
+            "UPDATE entries SET atime = ? WHERE hostname = ? AND job_id = ?",
+            [(atime, self.hostname, job_id) for job_id, atime in self._touched.items()],
+        )
+        self._touched.clear()
+
+    def close(self) -> None:
+        """
+        Writes the pending access times to the index and closes it.
+        The cache can still be used afterwards, without size limit.
+        """
+        if self._index is None:
+            return
+        try:
+            with self._index_lock:
+                with self._index:
+                    self._write_touched()
+                self._index.close()
+        except sqlite3.Error as e:
+            self.logger.error(f"Failed to update cache index: {e}")
+        self._index = None
+
+    def _record(self, job_id) -> None:
+        """
+        Adds a newly written cache entry to the index, then removes the least
+        recently used entries if the cache exceeds its maximum size.
+        """
+        if self._index is None:
+            return
+        try:
+            with self._index_lock, self._index:
+                # The entries read so far are not the least recently used
+                self._write_touched()
+                self._index.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                    (self.hostname, job_id, self._entry_size(job_id), time.time()),
+                )
+                self._written.add(job_id)
+                if self.max_size is not None:
+                    self._evict()
+        except sqlite3.Error as e:
+            self.logger.error(f"Failed to update cache index for job {job_id}: {e}")
+
+    def _evict(self) -> None:
+        """
+        Removes the least recently used entries until the cache fits
+        its maximum size. The entries written with this instance are never
+        removed, so the cache can exceed its maximum size by the data of
+        a single request.
+        """
+        assert self._index is not None
+        total = self._index.execute("SELECT SUM(size) FROM entries").fetchone()[0]
+        if total is None or total <= self.max_size:
+            return
+        candidates = self._index.execute(
+            "SELECT hostname, job_id, size FROM entries ORDER BY atime"
+        ).fetchall()
+        evicted = []
+        for hostname, job_id, size in candidates:
+            if total <= self.max_size:
+                break
+            if hostname == self.hostname and job_id in self._written:
+                continue
+            for extension in ENTRY_EXTENSIONS:
+                try:
+                    os.remove(
+                        os.path.join(self.cache_path, hostname, f"{job_id}{extension}")
+                    )
+                except FileNotFoundError:
+                    pass
+            evicted.append((hostname, job_id))
+            total -= size
+        self._index.executemany(
+            "DELETE FROM entries WHERE hostname = ? AND job_id = ?", evicted
+        )
+        self.logger.info(f"Removed {len(evicted)} entries from the cache.")
 
     def get_size(self) -> int:
+        """Returns the total size of the cache, in bytes."""
+        if self._index is not None:
+            try:
+                with self._index_lock:
+                    total = self._index.execute(
+                        "SELECT SUM(size) FROM entries"
+                    ).fetchone()[0]
+                return total or 0
+            except sqlite3.Error as e:
+                self.logger.error(f"Failed to read cache index: {e}")
+        # No index: compute it from the files. The DirEntry objects carry
+        # the file type from the directory listing, saving a stat per file.
         total = 0
-        try:
-            for dirpath, _, filenames in os.walk(self.cache_path):
-                for f in filenames:
-                    fp = os.path.join(dirpath, f)
-                    if not os.path.islink(fp):
-                        total += os.path.getsize(fp)
-        except FileNotFoundError:
-            return 0
+        dirs = [self.cache_path]
+        while dirs:
+            try:
+                with os.scandir(dirs.pop()) as entries:
+                    for entry in entries:
+                        if entry.is_file(follow_symlinks=False):
+                            total += entry.stat(follow_symlinks=False).st_size
+                        elif entry.is_dir(follow_symlinks=False):
+                            dirs.append(entry.path)
+            except FileNotFoundError:
+                pass
         return total
 
     def _file_path(self, job_id) -> str:
         return os.path.join(self.cache_host_dir, f"{job_id}.json")
 
+    def log_path(self, job_id) -> str:
+        """Returns the path of the cached log file of a job."""
+        return os.path.join(self.cache_host_dir, f"{job_id}.log")
+
+    def _compressed_log_path(self, job_id) -> str:
+        return os.path.join(self.cache_host_dir, f"{job_id}.log.zst")
+
+    def _parsed_log_path(self, job_id) -> str:
+        return os.path.join(self.cache_host_dir, f"{job_id}.parsed.json")
+
     def hit(self, job_id) -> bool:
         return os.path.exists(self._file_path(job_id))
 
     def get_data(self, job_id) -> dict | None:
         try:
-            with open(self._file_path(job_id), "r") as f:
-                cached_data = json.load(f)
+            with open(self._file_path(job_id), "rb") as f:
+                cached_data = _json_loads(f.read())
                 job_details = cached_data.get("job_details")
                 if job_details:
                     job_details["is_cached"] = True
+                    self._touch(job_id)
                     return job_details
                 else:
                     self.logger.info(
                         f"Missing job_details in cached_data for job {job_id}"
                     )
                     return None
+        except FileNotFoundError:
+            # Cache miss
+            return None
         except (IOError, json.JSONDecodeError) as e:
             self.logger.error(f"Error reading cache for job {job_id}: {e}")
             return None
@@ -115,13 +367,19 @@ class openQACache:
             A tuple containing the log content (str) and a boolean indicating
             if it was a cache hit. Returns (None, False) on a cache miss or error.
         """
-        cache_file = self._file_path(job_id)
-        if not os.path.exists(cache_file):
-            return None, False
+        # The log files are only created once complete, no need to check
+        # first that the cache entry is.
+        log_content = self.read_log(job_id)
+        if log_content:
+            self.logger.info(f"Cache hit for log content of job {job_id}.")
+            self._touch(job_id)
+            return log_content, True
 
+        # Cache files written by older versions have the log in the JSON file
+        cache_file = self._file_path(job_id)
         try:
-            with open(cache_file, "r") as f:
-                cached_data = json.load(f)
+            with open(cache_file, "rb") as f:
+                cached_data = _json_loads(f.read())
                 log_content = cached_data.get("log_content")
                 if log_content:
                     self.logger.info(f"Cache hit for log content of job {job_id}.")
@@ -131,23 +389,159 @@ class openQACache:
                         f"Cache file for job {job_id} exists but contains no 'log_content'."
                     )
                     return None, False
+        except FileNotFoundError:
+            # Cache miss
+            return None, False
         except (json.JSONDecodeError, IOError) as e:
             self.logger.error(f"Failed to read or parse cache file {cache_file}: {e}")
             return None, False
 
-    def write_data(self, job_id: str, job_details: dict, log_content: str) -> None:
+    def read_log(self, job_id: str) -> str | None:
         """
-        Writes job details and log content to a cache file.
+        Reads the cached log file of a job.
+
+        Args:
+            job_id: The ID of the job.
+
+        Returns:
+            The log content, or None if the file is missing, empty or unreadable.
+        """
+        data = None
+        log_file = self._compressed_log_path(job_id)
+        try:
+            if zstandard is not None:
+                try:
+                    with open(log_file, "rb") as f:
+                        data = zstandard.ZstdDecompressor().stream_reader(f).readall()
+                except FileNotFoundError:
+                    pass
+            if data is None:
+                # Not compressed, or zstandard not available
+                log_file = self.log_path(job_id)
+                with open(log_file, "rb") as f:
+                    data = f.read()
+        except FileNotFoundError:
+            return None
+        except (IOError, ZstdError) as e:
+            self.logger.error(f"Failed to read cache file {log_file}: {e}")
+            return None
+        log_content = data.decode("utf-8", errors="replace")
+        if not log_content:
+            self.logger.warning(f"Cache file {log_file} for job {job_id} is empty.")
+            return None
+        return log_content
+
+    def get_parsed_log(self, job_id: str, parser_key: str) -> dict | None:
+        """
+        Retrieves the result of parsing the log of a job, to not parse it again.
+
+        Args:
+            job_id: The ID of the job.
+            parser_key: Identifies the parser configuration used to parse
+                        the log. A result stored with another key is ignored.
+
+        Returns:
+            The parsed log as stored by `write_parsed_log`, or None if it is
+            missing, has been produced with another parser configuration or
+            cannot be read.
+        """
+        parsed_file = self._parsed_log_path(job_id)
+        try:
+            with open(parsed_file, "rb") as f:
+                cached_data = _json_loads(f.read())
+        except FileNotFoundError:
+            return None
+        except (IOError, json.JSONDecodeError) as e:
+            self.logger.error(f"Failed to read or parse cache file {parsed_file}: {e}")
+            return None
+        if cached_data.get("parser_key") != parser_key:
+            return None
+        self.logger.info(f"Cache hit for parsed log of job {job_id}.")
+        self._touch(job_id)
+        return cached_data.get("parsed_log")
+
+    def write_parsed_log(self, job_id: str, parser_key: str, parsed_log: dict) -> None:
+        """
+        Writes the result of parsing the log of a job to the cache.
+
+        Args:
+            job_id: The ID of the job.
+            parser_key: Identifies the parser configuration used to parse the log.
+            parsed_log: A dictionary with the parsing result.
+        """
+        try:
+            with open(self._parsed_log_path(job_id), "wb") as f:
+                f.write(
+                    _json_dumps({"parser_key": parser_key, "parsed_log": parsed_log})
+                )
+            self._record(job_id)
+        except (IOError, TypeError) as e:
+            self.logger.error(f"Failed to write parsed log for job {job_id}: {e}")
+
+    def write_data(
+        self, job_id: str, job_details: dict, log_content: str | None = None
+    ) -> None:
+        """
+        Writes job details and log content to the cache files.
 
         Args:
             job_id: The ID of the job.
             job_details: A dictionary containing the job's details.
-            log_content: A string containing the job's log content.
+            log_content: A string containing the job's log content. It can be
+                         omitted if the log has already been downloaded
+                         to `log_path()`.
         """
         cache_file = self._file_path(job_id)
         try:
-            with open(cache_file, "w") as f:
-                json.dump({"job_details": job_details, "log_content": log_content}, f)
+            # The JSON file is written last: it marks the cache entry as complete.
+            if log_content is not None:
+                self._write_log(job_id, log_content.encode("utf-8"))
+            elif zstandard is not None and os.path.exists(self.log_path(job_id)):
+                self._compress_log_file(job_id)
+            with open(cache_file, "wb") as f:
+                f.write(_json_dumps({"job_details": job_details}))
             self.logger.info(f"Successfully cached data for job {job_id}.")
-        except (IOError, TypeError) as e:
+            self._record(job_id)
+        except (IOError, TypeError, ZstdError) as e:
             self.logger.error(f"Failed to write cache for job {job_id}: {e}")
+
+    def _write_log(self, job_id: str, data: bytes) -> None:
+        """Writes the log file of a job, compressed if zstandard is available."""
+        if zstandard is None:
+            with self._open_for_replace(self.log_path(job_id)) as f:
+                f.write(data)
+            return
+        with self._open_for_replace(self._compressed_log_path(job_id)) as f:
+            f.write(zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data))
+
+    def _compress_log_file(self, job_id: str) -> None:
+        """Replaces the downloaded log file of a job with its compressed version."""
+        log_file = self.log_path(job_id)
+        with (
+            open(log_file, "rb") as src,
+            self._open_for_replace(self._compressed_log_path(job_id)) as dst,
+        ):
+            zstandard.ZstdCompressor(level=ZSTD_LEVEL).copy_stream(
+                src, dst, size=os.path.getsize(log_file)
+            )
+        os.remove(log_file)
+
+    @contextmanager
+    def _open_for_replace(self, path: str) -> Iterator[IO[bytes]]:
+        """
+        Opens a temporary file for writing, renamed to path once it is
+        successfully closed: readers never see a partially written file.
+        """
+        with tempfile.NamedTemporaryFile(
+            dir=self.cache_host_dir,
+            prefix=f"{os.path.basename(path)}.",
+            suffix=".tmp",
+            delete=False,
+        ) as f:
+            try:
+                yield f
+            except BaseException:
+                f.close()
+                os.remove(f.name)
+                raise
+        os.replace(f.name, path)
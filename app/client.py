@@ -1,10 +1,14 @@
 from openqa_client.client import OpenQA_Client
 from openqa_client.exceptions import RequestError
 from urllib.parse import urlparse
-from typing import Optional
-import re
+from concurrent.futures import ThreadPoolExecutor
+from itertools import takewhile
+from typing import Dict, List, Optional, Union
+import os
+import tempfile
 import requests
 import requests.exceptions
+from requests.adapters import HTTPAdapter, Retry
 import logging
 
 """Custom exception classes for the application."""
@@ -28,6 +32,10 @@ class OpenQAClientLogDownloadError(OpenQAClientError):
     pass
 
 
+# Maximum number of concurrent requests to the openQA server
+MAX_PARALLEL_REQUESTS = 16
+
+
 class OpenQAClientWrapper:
     """A wrapper class for the openqa_client to simplify interactions."""
 
@@ -46,11 +54,18 @@ class OpenQAClientWrapper:
             raise ValueError("Invalid URL provided. Could not parse hostname.")
         self.hostname = hostname
 
-        # Extract job_id from the URL path
-        match = re.search(r"/tests/(\d+)", parsed_url.path)
-        if not match:
+        # Extract job_id from the URL path: the digits right after the
+        # first '/tests/' followed by any, as in /tests/<job_id>/...
+        path = parsed_url.path
+        job_id = ""
+        position = path.find("/tests/")
+        while position != -1 and not job_id:
+            tail = path[position + len("/tests/") :]
+            job_id = "".join(takewhile(str.isdecimal, tail))
+            position = path.find("/tests/", position + 1)
+        if not job_id:
             raise ValueError("Could not find job ID in the URL.")
-        self.job_id = match.group(1)
+        self.job_id = job_id
 
         self._client: Optional[OpenQA_Client] = None
 
@@ -70,6 +85,34 @@ class OpenQAClientWrapper:
             self.app_logger.warning(
                 f"SSL certificate verification has been disabled for client connecting to {self.hostname}."
             )
+            # Keep enough connections alive for the concurrent requests,
+            # so that the TCP and TLS handshakes are done only once.
+            # The API requests are already retried by openqa_request.
+            adapter = HTTPAdapter(
+                pool_connections=MAX_PARALLEL_REQUESTS,
+                pool_maxsize=MAX_PARALLEL_REQUESTS,
+            )
+            client.session.mount("https://", adapter)
+            client.session.mount("http://", adapter)
+            # The log downloads are not: retry them on transient gateway
+            # errors only, not on connection or read timeouts. Once the
+            # retries are exhausted the last response is returned, for the
+            # callers to handle its status as before.
+            download_adapter = HTTPAdapter(
+                pool_connections=MAX_PARALLEL_REQUESTS,
+                pool_maxsize=MAX_PARALLEL_REQUESTS,
+                max_retries=Retry(
+                    total=2,
+                    connect=0,
+                    read=0,
+                    other=0,
+                    backoff_factor=0.2,
+                    status_forcelist=(502, 503, 504),
+                    raise_on_status=False,
+                ),
+            )
+            client.session.mount(f"https://{self.hostname}/tests/", download_adapter)
+            client.session.headers["Accept-Encoding"] = "gzip, deflate"
             self._client = client
         return self._client
 
@@ -102,6 +145,42 @@ class OpenQAClientWrapper:
             self.app_logger.error(error_message)
             raise OpenQAClientAPIError(error_message) from e
 
+    def get_job_details_many(
+        self, job_ids: List[str]
+    ) -> Dict[str, Union[dict, OpenQAClientAPIError]]:
+        """
+        Fetches the details of multiple jobs, with concurrent requests.
+
+        Args:
+            job_ids: The IDs of the jobs to fetch.
+
+        Returns:
+            A dictionary with the job ID as key and, as value, the job details
+            or the OpenQAClientAPIError raised fetching them. An error for a
+            job does not prevent fetching the others.
+        """
+        results: Dict[str, Union[dict, OpenQAClientAPIError]] = {}
+
+        def fetch(job_id: str) -> Union[dict, OpenQAClientAPIError]:
+            try:
+                return self.get_job_details(job_id)
+            except OpenQAClientAPIError as e:
+                return e
+
+        if len(job_ids) <= 1:
+            for job_id in job_ids:
+                results[job_id] = fetch(job_id)
+            return results
+        # Create the client before starting the threads,
+        # so that they all share the same one.
+        _ = self.client
+        with ThreadPoolExecutor(
+            max_workers=min(MAX_PARALLEL_REQUESTS, len(job_ids))
+        ) as executor:
+            for job_id, result in zip(job_ids, executor.map(fetch, job_ids)):
+                results[job_id] = result
+        return results
+
     def get_log_content(self, job_id: str, filename: str) -> str:
         """
         Downloads the content of a specific log file for a job.
@@ -126,6 +205,57 @@ class OpenQAClientWrapper:
             self.app_logger.error(error_message)
             raise OpenQAClientLogDownloadError(error_message) from e
 
+    def get_log_content_to_file(self, job_id: str, filename: str, out_path: str) -> int:
+        """
+        Downloads a specific log file for a job directly to disk, without
+        holding its whole content in memory.
+
+        The content is streamed to a temporary file next to `out_path`,
+        renamed to `out_path` only once the download is complete.
+
+        Args:
+            job_id: The ID of the job to fetch logs for.
+            filename: The name of the log file to download.
+            out_path: The path of the file to write.
+
+        Returns:
+            The number of bytes written.
+
+        Raises:
+            OpenQAClientLogDownloadError: If the download or the writing fails.
+        """
+        log_file_url = f"https://{self.hostname}/tests/{job_id}/file/{filename}"
+        tmp_path = None
+        size = 0
+        try:
+            with self.client.session.get(
+                log_file_url, stream=True, timeout=60
+            ) as log_response:
+                log_response.raise_for_status()
+                # A unique temporary file: concurrent requests for the same
+                # job, in other threads or processes, never share it.
+                with tempfile.NamedTemporaryFile(
+                    dir=os.path.dirname(out_path),
+                    prefix=f"{os.path.basename(out_path)}.",
+                    suffix=".tmp",
+                    delete=False,
+                ) as f:
+                    tmp_path = f.name
+                    for chunk in log_response.iter_content(chunk_size=1 << 20):
+                        f.write(chunk)
+                        size += len(chunk)
+            os.replace(tmp_path, out_path)
+            return size
+        except (requests.exceptions.RequestException, OSError) as e:
+            error_message = f"Failed to download log {filename} for job {job_id}: {e}"
+            self.app_logger.error(error_message)
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            raise OpenQAClientLogDownloadError(error_message) from e
+
     def get_job_url(self, job_id: str) -> str:
         """Constructs the full URL for a given job ID."""
         return f"https://{self.hostname}/t{job_id}"
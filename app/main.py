@@ -1,18 +1,28 @@
-from flask import Flask, jsonify, render_template, request
+from flask import Flask, render_template, request
 from typing import Any, Dict, List, Optional, Tuple
 
 import logging
 import time
 import json
-import os
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+
+try:
+    # Much faster than jsonify on the big responses with all the parsed logs
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore[assignment]
+
 from . import load_configuration
 from .autoinst_parser import parse_autoinst_log
 from .cache import openQACache
 from .client import (
-    OpenQAClientWrapper,
-    OpenQAClientError,
+    MAX_PARALLEL_REQUESTS,
     OpenQAClientAPIError,
+    OpenQAClientError,
     OpenQAClientLogDownloadError,
+    OpenQAClientWrapper,
 )
 
 app = Flask(__name__)
@@ -24,6 +34,29 @@ app = Flask(__name__)
     perl_exception_re,
     MAX_JOBS_TO_EXPLORE,
 ) = load_configuration(app.logger)
+# Unique event types to be used by the frontend for coloring,
+# they only depend on the configuration.
+EVENT_TYPES = sorted(
+    {
+        channel["type"]
+        for parser in autoinst_log_parsers
+        for channel in parser.get("channels", [])
+        if channel.get("type")
+    }
+    | {"exception"}
+)
+
+
+def _dumps(obj: Any) -> bytes:
+    """Serializes an object to JSON bytes, using orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj).encode("utf-8")
+
+
+def _json_response(obj: Any, status: int = 200):
+    """Creates a JSON response, like jsonify but using orjson when available."""
+    return app.response_class(_dumps(obj), status=status, mimetype="application/json")
 
 
 def format_job_name(full_name: str) -> str:
@@ -96,7 +129,7 @@ def find_event_pairs(
     # Use a dictionary to track the last seen 'create' event for each mutex name
     last_mutex_create_event = {}
     # Use a dictionary of stacks to track open locks for each mutex name
-    open_locks: dict[str, list] = {}
+    open_locks: defaultdict[str, list] = defaultdict(list)
     # Use a dictionary to track the last seen 'create' event for each barrier name
     last_barrier_create_event = {}
 
@@ -108,15 +141,14 @@ def find_event_pairs(
         if event_type == "mutex":
             mutex_name = event.get("mutex")
             if not mutex_name:
-                app_logger.debug(f"Ignoring mutex: {event}")
+                # Lazy formatting: the event is only printed if debug is enabled
+                app_logger.debug("Ignoring mutex: %s", event)
                 continue
             event_count += 1
 
             if event_name == "mutex_create":
                 last_mutex_create_event[mutex_name] = event
             elif event_name == "mutex_lock":
-                if mutex_name not in open_locks:
-                    open_locks[mutex_name] = []
                 open_locks[mutex_name].append(event)
             elif event_name == "mutex_unlock":
                 # Pair with last 'create' event for readiness signal
@@ -131,7 +163,8 @@ def find_event_pairs(
                         }
                     )
                 # Pair with last 'lock' event for critical section
-                if mutex_name in open_locks and open_locks[mutex_name]:
+                # Not open_locks[mutex_name]: it would add an empty stack
+                if open_locks.get(mutex_name):
                     lock_event = open_locks[mutex_name].pop()
                     all_pairs.append(
                         {
@@ -145,7 +178,7 @@ def find_event_pairs(
         elif event_type == "barrier":
             barrier_name = event.get("barrier")
             if not barrier_name:
-                app_logger.debug(f"Ignoring barrier: {event}")
+                app_logger.debug("Ignoring barrier: %s", event)
                 continue
             event_count += 1
 
@@ -194,7 +227,9 @@ def create_timeline_events(all_job_details: dict) -> list:
 
     if timeline_events:
         # This sort will now work safely as all items have a timestamp.
-        timeline_events.sort(key=lambda x: x["timestamp"])
+        # The events of each job are already in order: the sort only
+        # merges these runs.
+        timeline_events.sort(key=itemgetter("timestamp"))
     return timeline_events
 
 
@@ -220,57 +255,76 @@ def discover_jobs(
         A tuple containing a dictionary of all job details and a dictionary of performance metrics.
     """
     all_job_details = {}
-    jobs_to_fetch = [initial_job_id]
+    jobs_to_fetch = deque([initial_job_id])
     # This set is crucial for tracking visited jobs to prevent re-fetching and
     # to avoid getting stuck in circular dependencies (e.g., parent -> child -> parent).
     fetched_jobs: set[str] = set()
+    # All the jobs ever added to jobs_to_fetch, so that each one is queued once.
+    queued_jobs = {initial_job_id}
     performance_metrics = {"api_calls": [], "cache_hits": 0}
 
     discovery_loop_start = time.perf_counter()
     while jobs_to_fetch and len(fetched_jobs) < max_jobs:
-        current_job_id = jobs_to_fetch.pop(0)
-        if current_job_id in fetched_jobs:
-            app.logger.debug(f"Skipping already fetched job {current_job_id}.")
-            continue
-        fetched_jobs.add(current_job_id)
-        job_details = None
-
-        if not ignore_cache and cache.hit(current_job_id):
-            debug_log.append(
-                {"level": "info", "message": f"Cache hit for job {current_job_id}."}
-            )
-            app.logger.info(f"Cache hit for job {current_job_id}.")
-            performance_metrics["cache_hits"] += 1
-            job_details = cache.get_data(current_job_id)
-        else:
-            app.logger.info(
-                f"Cache miss for job {current_job_id} and ignore_cache:{ignore_cache}."
-            )
+        # Take from the queue all the jobs that can still be explored,
+        # so that the ones not in the cache are fetched together.
+        batch = []
+        while jobs_to_fetch and len(fetched_jobs) < max_jobs:
+            current_job_id = jobs_to_fetch.popleft()
+            fetched_jobs.add(current_job_id)
+            batch.append(current_job_id)
+
+        batch_details: Dict[str, Any] = {}
+        for current_job_id in batch:
+            # Trying to read the cache file directly is cheaper than
+            # checking first that it exists.
+            job_details = None if ignore_cache else cache.get_data(current_job_id)
+            if job_details:
+                debug_log.append(
+                    {"level": "info", "message": f"Cache hit for job {current_job_id}."}
+                )
+                app.logger.info(f"Cache hit for job {current_job_id}.")
+                performance_metrics["cache_hits"] += 1
+            else:
+                app.logger.info(
+                    f"Cache miss for job {current_job_id} and ignore_cache:{ignore_cache}."
+                )
 
-        if not job_details:
-            debug_log.append(
-                {
-                    "level": "info",
-                    "message": f"Cache miss for job {current_job_id} or ignore_cache:{ignore_cache}. Fetching from openQA...",
-                }
-            )
-            try:
-                api_call_start = time.perf_counter()
-                job_details = client.get_job_details(current_job_id)
-                api_call_end = time.perf_counter()
+            if not job_details:
+                debug_log.append(
+                    {
+                        "level": "info",
+                        "message": f"Cache miss for job {current_job_id} or ignore_cache:{ignore_cache}. Fetching from openQA...",
+                    }
+                )
+            batch_details[current_job_id] = job_details
+
+        to_download = [job_id for job_id in batch if not batch_details[job_id]]
+        api_results: Dict[str, Any] = {}
+        api_call_start = time.perf_counter()
+        if to_download:
+            api_results = client.get_job_details_many(to_download)
+        api_call_end = time.perf_counter()
+
+        for current_job_id in batch:
+            job_details = batch_details[current_job_id]
+            if current_job_id in api_results:
+                job_details = api_results[current_job_id]
+                if isinstance(job_details, OpenQAClientAPIError):
+                    error_message = str(job_details)
+                    all_job_details[current_job_id] = {"error": error_message}
+                    debug_log.append({"level": "error", "message": error_message})
+                    continue
+                # Concurrent requests overlap: the duration is the one of
+                # the whole batch the job has been fetched in.
                 performance_metrics["api_calls"].append(
                     {
                         "job_id": current_job_id,
                         "duration": api_call_end - api_call_start,
                     }
                 )
-            except OpenQAClientAPIError as e:
-                error_message = str(e)
-                all_job_details[current_job_id] = {"error": error_message}
-                debug_log.append({"level": "error", "message": error_message})
-                continue
 
-        if job_details:
+            if not job_details:
+                continue
             job_details["short_name"] = format_job_name(job_details.get("name", ""))
             job_details["job_url"] = client.get_job_url(current_job_id)
             all_job_details[current_job_id] = job_details
@@ -286,8 +340,10 @@ def discover_jobs(
                 parallel_jobs = job_details.get(relation, {}).get("Parallel", [])
                 if parallel_jobs:
                     for parallel_id in parallel_jobs:
-                        if str(parallel_id) not in fetched_jobs:
-                            jobs_to_fetch.append(str(parallel_id))
+                        parallel_id = str(parallel_id)
+                        if parallel_id not in queued_jobs:
+                            queued_jobs.add(parallel_id)
+                            jobs_to_fetch.append(parallel_id)
 
     discovery_loop_end = time.perf_counter()
     performance_metrics["discovery_loop_duration"] = (
@@ -306,7 +362,9 @@ def process_job_logs(
 
     This function iterates through the discovered jobs, downloads the logs for
     jobs that are 'done', and then parses them. It uses the cache to avoid
-    re-downloading logs.
+    re-downloading logs, and to not parse again the logs already parsed
+    with the same parser configuration. The logs missing from the cache are
+    downloaded concurrently, once all the cached ones are parsed.
 
     Args:
         client: An instance of OpenQAClientWrapper.
@@ -319,9 +377,15 @@ def process_job_logs(
         - The updated dictionary of all job details (now including log data).
         - A dictionary of performance metrics for the log processing phase.
     """
-    performance_metrics = {"log_downloads": [], "log_parsing": [], "cache_hits": 0}
+    performance_metrics: Dict[str, Any] = {
+        "log_downloads": [],
+        "log_parsing": [],
+        "cache_hits": 0,
+    }
     log_processing_start = time.perf_counter()
 
+    to_download = []
+    parsers: Dict[str, Optional[Dict[str, Any]]] = {}
     for job_id_key, job_details in all_job_details.items():
         if job_details.get("state") != "done":
             job_details["autoinst-log"] = (
@@ -329,24 +393,71 @@ def process_job_logs(
             )
             continue
 
+        parser = parsers[job_id_key] = _find_parser(job_details)
+        if parser:
+            parsed_log = cache.get_parsed_log(job_id_key, parser["cache_key"])
+            if parsed_log:
+                job_details.update(parsed_log)
+                performance_metrics["cache_hits"] += 1
+                continue
+
         log_content, was_cached = cache.get_log_content(job_id_key)
         if was_cached:
             performance_metrics["cache_hits"] += 1
 
-        if not log_content:
-            log_content, perf = _get_log_from_api(
-                client, job_id_key, job_details, debug_log, cache
-            )
-            if perf:
-                performance_metrics["log_downloads"].append(perf)
-
         if log_content:
             _parse_log_content(
-                job_details, log_content, job_id_key, performance_metrics
+                job_details, log_content, job_id_key, performance_metrics, parser, cache
             )
         else:
-            # This case is hit if log download failed and error was already logged.
-            pass
+            to_download.append(job_id_key)
+
+    # Each download gets its own debug log, merged in the job order
+    # once they are all completed.
+    job_debug_logs: Dict[str, List[Dict[str, Any]]] = {
+        job_id_key: [] for job_id_key in to_download
+    }
+
+    def download(job_id_key: str) -> Optional[Dict[str, Any]]:
+        return _get_log_from_api(
+            client,
+            job_id_key,
+            all_job_details[job_id_key],
+            job_debug_logs[job_id_key],
+            cache,
+        )
+
+    if len(to_download) > 1:
+        with ThreadPoolExecutor(
+            max_workers=min(MAX_PARALLEL_REQUESTS, len(to_download))
+        ) as executor:
+            downloads = list(executor.map(download, to_download))
+    else:
+        downloads = [download(job_id_key) for job_id_key in to_download]
+
+    for job_id_key, perf in zip(to_download, downloads):
+        debug_log.extend(job_debug_logs[job_id_key])
+        if not perf:
+            # The download failed and the error was already logged.
+            continue
+        performance_metrics["log_downloads"].append(perf)
+        # The log is read back from the cache one job at a time
+        log_content = cache.read_log(job_id_key)
+        if not log_content:
+            error_msg = (
+                f"Failed to read the downloaded log of job {job_id_key} from the cache."
+            )
+            all_job_details[job_id_key]["autoinst-log"] = f"ERROR: {error_msg}"
+            debug_log.append({"level": "error", "message": error_msg})
+            continue
+        _parse_log_content(
+            all_job_details[job_id_key],
+            log_content,
+            job_id_key,
+            performance_metrics,
+            parsers[job_id_key],
+            cache,
+        )
 
     log_processing_end = time.perf_counter()
     performance_metrics["log_processing_duration"] = (
@@ -367,10 +478,15 @@ def analyze():
     app.logger.debug(
         f"analyze() route handler started. Logger level is {app.logger.level}::{logging.getLevelName(app.logger.level)}."
     )
-    log_url = request.json["log_url"]
-    ignore_cache = request.json.get("ignore_cache", False)
+    body = request.json
+    log_url = body["log_url"]
+    ignore_cache = body.get("ignore_cache", False)
+    # Without the logs only the job details are returned, from the cache
+    # when possible: no log is read, downloaded or parsed.
+    include_logs = body.get("include_logs", True)
     job_id = "unknown"
     hostname = None
+    cache = None
     debug_log = []
     performance_metrics = {"total_duration": 0, "cache_hits": 0}
     try:
@@ -388,7 +504,7 @@ def analyze():
             error_msg = f"Error parsing URL: {e}"
             debug_log.append({"level": "error", "message": error_msg})
             app.logger.error(error_msg)
-            return jsonify({"error": error_msg, "debug_log": debug_log}), 400
+            return _json_response({"error": error_msg, "debug_log": debug_log}, 400)
 
         cache = openQACache(CACHE_DIR, hostname, CACHE_MAX_SIZE, app.logger)
 
@@ -399,12 +515,13 @@ def analyze():
         performance_metrics.update(perf_discovery)
 
         # 2. Process logs for all discovered jobs
-        all_job_details, perf_logs = process_job_logs(
-            client, cache, all_job_details, debug_log
-        )
-        # Manually aggregate cache_hits from the two separate counters
-        performance_metrics["cache_hits"] += perf_logs.pop("cache_hits", 0)
-        performance_metrics.update(perf_logs)
+        if include_logs:
+            all_job_details, perf_logs = process_job_logs(
+                client, cache, all_job_details, debug_log
+            )
+            # Manually aggregate cache_hits from the two separate counters
+            performance_metrics["cache_hits"] += perf_logs.pop("cache_hits", 0)
+            performance_metrics.update(perf_logs)
 
         # 3. Build final response data from processed jobs
         timeline_creation_start = time.perf_counter()
@@ -425,68 +542,39 @@ def analyze():
             "pairs_created": len(all_event_pairs),
         }
 
-        # Generate a list of unique event types to be used by the frontend for coloring
-        all_types = set()
-        for parser in autoinst_log_parsers:
-            for channel in parser.get("channels", []):
-                type_name = channel.get("type")
-                if type_name:
-                    all_types.add(type_name)
-        all_types.add("exception")
-
         response_data = {
             "jobs": all_job_details,
             "debug_log": debug_log,
             "timeline_events": timeline_events,
-            "event_types": sorted(list(all_types)),
+            "event_types": EVENT_TYPES,
             "event_pairs": all_event_pairs,
         }
-        json_response_data = json.dumps(response_data)
-        performance_metrics["response_size_bytes"] = len(
-            json_response_data.encode("utf-8")
-        )
+        # Serialized only once, the size is the one of the response body
+        response = _json_response(response_data)
+        performance_metrics["response_size_bytes"] = response.content_length
 
         request_end_time = time.perf_counter()
         performance_metrics["total_duration"] = request_end_time - request_start_time
 
-        app.logger.info("--- Performance Metrics ---")
-        app.logger.info(json.dumps(performance_metrics, indent=4))
-        app.logger.info("---------------------------")
+        if app.logger.isEnabledFor(logging.INFO):
+            app.logger.info("--- Performance Metrics ---")
+            app.logger.info(json.dumps(performance_metrics, indent=4))
+            app.logger.info("---------------------------")
 
         app.logger.info(
             f"Successfully fetched details for jobs: {list(all_job_details.keys())}"
         )
-        return jsonify(response_data)
+        return response
     except Exception as e:
         error_message = f"An unexpected error occurred: {e}"
         if hostname:
             error_message = f"Error connecting to {hostname}: {e}"
         debug_log.append({"level": "error", "message": error_message})
         app.logger.exception(error_message)
-        return jsonify({"error": error_message, "debug_log": debug_log}), 500
-
-
-def _get_log_from_cache(hostname: str, job_id_key: str) -> Tuple[Optional[str], bool]:
-    """Attempt to retrieve log content from the cache.
-
-    Args:
-        hostname: The hostname of the openQA server.
-        job_id_key: The ID of the job.
-
-    Returns:
-        A tuple containing the log content (str or None) and a boolean
-        indicating if the cache was hit.
-    """
-    cache_file_path = os.path.join(
-        os.path.join(CACHE_DIR, hostname), f"{job_id_key}.json"
-    )
-    if os.path.exists(cache_file_path):
-        with open(cache_file_path, "r") as f:
-            cached_data = json.load(f)
-            log_content = cached_data.get("log_content")
-            if log_content:
-                return log_content, True  # Return content and cache hit status
-    return None, False  # Return no content and no cache hit
+        return _json_response({"error": error_message, "debug_log": debug_log}, 500)
+    finally:
+        if cache is not None:
+            cache.close()
 
 
 def _get_log_from_api(
@@ -495,7 +583,7 @@ def _get_log_from_api(
     job_details: Dict[str, Any],
     debug_log: List[Dict[str, Any]],
     cache: openQACache,
-) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+) -> Optional[Dict[str, Any]]:
     """Download log content from the API and cache it.
 
     Args:
@@ -506,30 +594,53 @@ def _get_log_from_api(
         cache: An instance of the openQACache.
 
     Returns:
-        A tuple containing the log content (str) and performance metrics (dict),
-        or (None, None) if an error occurs.
+        The performance metrics (dict) of the download, or None if an error
+        occurs. The log content is then available from the cache.
     """
     try:
         log_download_start = time.perf_counter()
-        log_content = client.get_log_content(job_id_key, "autoinst-log.txt")
+        # The log is streamed straight to its cache file, not held in memory
+        size_bytes = client.get_log_content_to_file(
+            job_id_key, "autoinst-log.txt", cache.log_path(job_id_key)
+        )
         log_download_end = time.perf_counter()
         perf = {
             "job_id": job_id_key,
             "duration": log_download_end - log_download_start,
-            "size_bytes": len(log_content.encode("utf-8")),
+            "size_bytes": size_bytes,
         }
 
-        # Save the newly downloaded log to cache
-        cache.write_data(job_id_key, job_details, log_content)
+        # Complete the cache entry with the job details
+        cache.write_data(job_id_key, job_details)
         debug_log.append(
             {"level": "info", "message": f"Cached data for job {job_id_key}."}
         )
-        return log_content, perf
+        return perf
     except OpenQAClientLogDownloadError as e:
         error_msg = str(e)
         job_details["autoinst-log"] = f"ERROR: {error_msg}"
         debug_log.append({"level": "error", "message": error_msg})
-        return None, None
+        return None
+
+
+def _find_parser(job_details: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Find the parser from the config to use for a job, by its name.
+
+    Args:
+        job_details: The dictionary with job details.
+
+    Returns:
+        The first parser whose 'match_name' matches the job name, or None.
+    """
+    for parser in autoinst_log_parsers:
+        match_name_re = parser.get("match_name")
+        if match_name_re and match_name_re.search(job_details.get("name", "")):
+            app.logger.info(
+                f"Using parser '{parser['name']}' for job '{job_details.get('name', '')}'"
+            )
+            return parser
+    app.logger.info(f"No matching parser found for job '{job_details.get('name', '')}'")
+    return None
 
 
 def _parse_log_content(
@@ -537,25 +648,22 @@ def _parse_log_content(
     log_content: str,
     job_id_key: str,
     performance_metrics: Dict[str, Any],
+    parser_to_use: Optional[Dict[str, Any]],
+    cache: openQACache,
 ) -> None:
-    """Parse the log content using the appropriate parser from the config.
+    """Parse the log content with the parser selected for the job.
+
+    The result is stored in the cache, to be reused as long as the parser
+    configuration does not change.
 
     Args:
         job_details: The dictionary with job details.
         log_content: The content of the log file.
         job_id_key: The ID of the job.
         performance_metrics: The dictionary to store performance metrics.
+        parser_to_use: The parser from the config, see `_find_parser`.
+        cache: An instance of the openQACache.
     """
-    parser_to_use = None
-    for parser in autoinst_log_parsers:
-        match_name_re = parser.get("match_name")
-        if match_name_re and match_name_re.search(job_details.get("name", "")):
-            parser_to_use = parser
-            app.logger.info(
-                f"Using parser '{parser['name']}' for job '{job_details.get('name', '')}'"
-            )
-            break
-
     if parser_to_use:
         log_parsing_start = time.perf_counter()
         parsed_log, optional_columns, line_count, match_count = parse_autoinst_log(
@@ -563,6 +671,7 @@ def _parse_log_content(
             parser_to_use["channels"],
             timestamp_re,
             perl_exception_re,
+            parser_to_use.get("channel_matcher"),
         )
         job_details["autoinst-log"] = parsed_log
         job_details["optional_columns"] = optional_columns
@@ -576,10 +685,16 @@ def _parse_log_content(
             }
         )
         job_details["parser_name"] = parser_to_use["name"]
-    else:
-        app.logger.info(
-            f"No matching parser found for job '{job_details.get('name', '')}'"
+        cache.write_parsed_log(
+            job_id_key,
+            parser_to_use["cache_key"],
+            {
+                "autoinst-log": parsed_log,
+                "optional_columns": optional_columns,
+                "parser_name": parser_to_use["name"],
+            },
         )
+    else:
         job_details["parser_name"] = "N/A"
 
 
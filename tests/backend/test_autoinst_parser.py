@@ -1,5 +1,5 @@
 import re
-from app.autoinst_parser import parse_autoinst_log
+from app.autoinst_parser import ChannelMatcher, _required_literal, parse_autoinst_log
 
 
 def test_parse_autoinst_log():
@@ -29,8 +29,10 @@ Can't call method "click" on an undefined value at /usr/lib/os-autoinst/consoles
             "pattern": re.compile(r"mutex unlock '(?P<mutex>[^']+)'"),
         },
     ]
-    timestamp_re = re.compile(r"^\[([^\]]+)\]")
-    perl_exception_re = re.compile(r" at .*?\.pm line \d+")
+    timestamp_re = re.compile(
+        r"^\[(?P<timestamp>[^\]\n]+)\](?P<message>.*)", re.MULTILINE
+    )
+    perl_exception_re = re.compile(r" at [^ \n]*\.pm line \d+")
 
     parsed_log, optional_columns, line_count, match_count = parse_autoinst_log(
         log_content, patterns, timestamp_re, perl_exception_re
@@ -60,3 +62,308 @@ Can't call method "click" on an undefined value at /usr/lib/os-autoinst/consoles
     assert parsed_log[3]["timestamp"] == "2025-09-01T10:00:03.000Z"
     assert parsed_log[3]["event_name"] == "mutex_unlock"
     assert parsed_log[3]["mutex"] == "test_mutex"
+
+
+def test_parse_autoinst_log_exception_at_end():
+    """
+    Tests an exception block at the very end of the log, not followed by
+    any timestamped line and without a trailing new line.
+    """
+    log_content = (
+        "[2025-09-01T10:00:00.000Z] [debug] mutex create 'test_mutex'\n"
+        "\n"
+        "Died at /usr/lib/os-autoinst/basetest.pm line 42.\n"
+        "    basetest::runtest() called"
+    )
+    patterns = [
+        {
+            "name": "mutex_create",
+            "type": "mutex",
+            "pattern": re.compile(r"mutex create '(?P<mutex>[^']+)'"),
+        },
+    ]
+    timestamp_re = re.compile(
+        r"^\[(?P<timestamp>[^\]\n]+)\](?P<message>.*)", re.MULTILINE
+    )
+    perl_exception_re = re.compile(r" at [^ \n]*\.pm line \d+")
+
+    parsed_log, _, line_count, match_count = parse_autoinst_log(
+        log_content, patterns, timestamp_re, perl_exception_re
+    )
+
+    assert line_count == 4
+    assert match_count == 2
+    assert parsed_log[0]["message"] == "[debug] mutex create 'test_mutex'"
+    assert parsed_log[1]["type"] == "exception"
+    assert parsed_log[1]["message"] == (
+        "Died at /usr/lib/os-autoinst/basetest.pm line 42.\n"
+        "    basetest::runtest() called"
+    )
+
+
+def test_parse_autoinst_log_first_matching_channel():
+    """
+    Tests that, when more channels match the same line, the first one in the
+    configuration order wins, even if a later one matches earlier in the line.
+    Also tests channels sharing the same named group.
+    """
+    log_content = (
+        "[2025-09-01T10:00:00.000Z] [debug] mutex lock 'm1' unavailable, sleeping\n"
+        "[2025-09-01T10:00:01.000Z] [debug] mutex lock 'm1'\n"
+        "[2025-09-01T10:00:02.000Z] [debug] barrier wait 'b1'\n"
+    )
+    patterns = [
+        {
+            "name": "barrier_wait",
+            "type": "barrier",
+            "pattern": re.compile(r"barrier wait '(?P<barrier>[^']+)'"),
+        },
+        {
+            "name": "mutex_lock_unavailable",
+            "type": "waiting",
+            "pattern": re.compile(r"'(?P<mutex>[^']+)'.*unavailable"),
+        },
+        {
+            "name": "mutex_lock",
+            "type": "mutex",
+            "pattern": re.compile(r"mutex lock '(?P<mutex>[^']+)'"),
+        },
+    ]
+    timestamp_re = re.compile(
+        r"^\[(?P<timestamp>[^\]\n]+)\](?P<message>.*)", re.MULTILINE
+    )
+    perl_exception_re = re.compile(r" at [^ \n]*\.pm line \d+")
+
+    parsed_log, optional_columns, _, match_count = parse_autoinst_log(
+        log_content, patterns, timestamp_re, perl_exception_re
+    )
+
+    assert match_count == 3
+    assert optional_columns == ["barrier", "mutex"]
+    assert parsed_log[0]["event_name"] == "mutex_lock_unavailable"
+    assert parsed_log[0]["mutex"] == "m1"
+    assert parsed_log[1]["event_name"] == "mutex_lock"
+    assert parsed_log[1]["mutex"] == "m1"
+    assert parsed_log[2]["event_name"] == "barrier_wait"
+    assert parsed_log[2]["barrier"] == "b1"
+    assert "mutex" not in parsed_log[2]
+
+
+def test_channel_matcher_patterns_semantic():
+    """
+    Tests that combining the channels does not change the result of each
+    channel pattern: leading wildcards, inline flags, named and numbered
+    back references.
+    """
+    channels = [
+        {
+            "name": "greedy",
+            "type": "error",
+            "pattern": re.compile(r".*barrier '(?P<barrier>[^']+)': timeout"),
+        },
+        {
+            "name": "ignorecase",
+            "type": "mutex",
+            "pattern": re.compile(r"(?i)mutex create '(?P<mutex>[^']+)'"),
+        },
+        {
+            "name": "verbose",
+            "type": "module",
+            "pattern": re.compile(r"(?x) starting \s (?P<module>\w+)  # module name"),
+        },
+        {
+            "name": "backref",
+            "type": "mutex",
+            "pattern": re.compile(r"(?P<mutex>\w+)=(?P=mutex)"),
+        },
+        {
+            "name": "group",
+            "type": "module",
+            "pattern": re.compile(r"(q)"),
+        },
+        {
+            "name": "numbered_backref",
+            "type": "barrier",
+            "pattern": re.compile(r"(['\"])(?P<barrier>y)\1"),
+        },
+    ]
+    matcher = ChannelMatcher(channels)
+    # The combined regex is only compiled on first use
+    assert matcher._dispatch is None
+
+    channel, match = matcher.match("barrier 'b1': timeout, barrier 'b2': timeout")
+    assert channel["name"] == "greedy"
+    # Same as the original pattern: the greedy leading '.*' picks the last one
+    assert match.group("barrier") == "b2"
+
+    channel, match = matcher.match("MUTEX CREATE 'm1'")
+    assert channel["name"] == "ignorecase"
+    assert match.group("mutex") == "m1"
+
+    channel, match = matcher.match("[debug] starting boot")
+    assert channel["name"] == "verbose"
+    assert match.group("module") == "boot"
+
+    channel, match = matcher.match("abc=abc")
+    assert channel["name"] == "backref"
+    assert match.group("mutex") == "abc"
+
+    assert matcher.match("abc=abd") is None
+
+    # Numbered back references refer to the channel own groups
+    channel, match = matcher.match("x'y'")
+    assert channel["name"] == "numbered_backref"
+    assert match.group("barrier") == "y"
+    assert matcher.match("x'y\"") is None
+    # A channel defined before it still wins
+    channel, _ = matcher.match("q'y'")
+    assert channel["name"] == "group"
+    assert ChannelMatcher([]).match("anything") is None
+
+
+def test_channel_matcher_candidate_lines():
+    """
+    Tests that only the lines containing the literal text required by the
+    channels are candidates, and that all lines are when one has none.
+    """
+    channels = [
+        {
+            "name": "mutex_lock",
+            "type": "mutex",
+            "pattern": re.compile(r"mutex lock '(?P<mutex>[^']+)'"),
+        },
+        {
+            "name": "mutex_lock_unavailable",
+            "type": "waiting",
+            "pattern": re.compile(r"(?:mutex) lock '[^']+' unavailable"),
+        },
+        {
+            "name": "verbose",
+            "type": "module",
+            "pattern": re.compile(r"(?x) starting \s (?P<module>\w+)"),
+        },
+    ]
+    text = "a mutex lock 'm1'\nnothing\n[debug] starting boot\nmutex\nmutex lock 'm2"
+    assert ChannelMatcher(channels).candidate_lines(text) == [0, 26, 54]
+
+    channels.append(
+        {
+            "name": "ignorecase",
+            "type": "mutex",
+            "pattern": re.compile(r"(?i)mutex create"),
+        }
+    )
+    assert ChannelMatcher(channels).candidate_lines(text) is None
+
+
+def test_parse_autoinst_log_exception_blocks():
+    """
+    Tests exception blocks at the beginning and in the middle of the log,
+    surrounded by lines that do not match any channel.
+    """
+    log_content = (
+        "Died at /usr/lib/os-autoinst/bmwqemu.pm line 7.\n"
+        "[2025-09-01T10:00:00.000Z] [debug] nothing at /tmp/x.pm line 1\n"
+        "[2025-09-01T10:00:01.000Z] [debug] mutex create 'test_mutex'\n"
+        "some output\n"
+        "Died at /usr/lib/os-autoinst/basetest.pm line 42.\n"
+        "    basetest::runtest() called at /usr/lib/os-autoinst/autotest.pm line 9\n"
+        "[2025-09-01T10:00:02.000Z] [debug] something else\n"
+    )
+    patterns = [
+        {
+            "name": "mutex_create",
+            "type": "mutex",
+            "pattern": re.compile(r"mutex create '(?P<mutex>[^']+)'"),
+        },
+    ]
+    timestamp_re = re.compile(
+        r"^\[(?P<timestamp>[^\]\n]+)\](?P<message>.*)", re.MULTILINE
+    )
+    perl_exception_re = re.compile(r" at [^ \n]*\.pm line \d+")
+
+    parsed_log, _, line_count, match_count = parse_autoinst_log(
+        log_content, patterns, timestamp_re, perl_exception_re
+    )
+
+    assert line_count == 7
+    assert match_count == 3
+    assert parsed_log[0]["type"] == "exception"
+    assert parsed_log[0]["timestamp"] is None
+    assert parsed_log[0]["message"] == "Died at /usr/lib/os-autoinst/bmwqemu.pm line 7."
+    assert parsed_log[1]["event_name"] == "mutex_create"
+    assert parsed_log[2]["type"] == "exception"
+    assert parsed_log[2]["timestamp"] == "2025-09-01T10:00:01.001000Z"
+    assert parsed_log[2]["message"] == (
+        "some output\n"
+        "Died at /usr/lib/os-autoinst/basetest.pm line 42.\n"
+        "    basetest::runtest() called at /usr/lib/os-autoinst/autotest.pm line 9"
+    )
+
+    # Other exception regexes, with another or without any required
+    # literal text, find the same blocks.
+    for other_exception_re in [
+        r"(?: at [^ \n]*\.pm| in \S+) line \d+",
+        r"(?i) AT [^ \n]*\.PM LINE \d+",
+    ]:
+        other_log, *_ = parse_autoinst_log(
+            log_content, patterns, timestamp_re, re.compile(other_exception_re)
+        )
+        assert other_log == parsed_log
+    # Exceptions not from a '.pm' file
+    pl_log = "[2025-09-01T10:00:00.000Z] [debug] ok\nDied at /tmp/test.pl line 3.\n"
+    for other_exception_re in [r" at \S+\.pl line \d+", r"(?i) AT \S+ LINE \d+"]:
+        other_log, *_ = parse_autoinst_log(
+            pl_log, patterns, timestamp_re, re.compile(other_exception_re)
+        )
+        assert [e["message"] for e in other_log] == ["Died at /tmp/test.pl line 3."]
+
+
+def test_parse_autoinst_log_escaped_characters():
+    """Tests that channels with escaped characters still match."""
+    log_content = (
+        "[2025-09-01T10:00:00.000Z] [debug] mutex lock 'm1'\n"
+        "[2025-09-01T10:00:01.000Z] [debug] something else\n"
+    )
+    patterns = [
+        {
+            "name": "mutex_lock",
+            "type": "mutex",
+            "pattern": re.compile(r"mutex\x20lock\N{SPACE}\047(?P<mutex>[^']+)'"),
+        },
+    ]
+    timestamp_re = re.compile(
+        r"^\[(?P<timestamp>[^\]\n]+)\](?P<message>.*)", re.MULTILINE
+    )
+    perl_exception_re = re.compile(r" at [^ \n]*\.pm line \d+")
+
+    parsed_log, _, _, match_count = parse_autoinst_log(
+        log_content, patterns, timestamp_re, perl_exception_re
+    )
+
+    assert match_count == 1
+    assert parsed_log[0]["mutex"] == "m1"
+
+
+def test_required_literal():
+    """Tests the literal text found in the patterns, or its absence."""
+    cases = {
+        r"starting (?P<module>\S+) tests/\S+\.pm": "starting ",
+        r".*barrier '(?P<barrier>[^']+)': timeout": "': timeout",
+        r" at [^ \n]*\.pm line \d+": ".pm line ",
+        r"mutex lock '[^']+'x?yz": "mutex lock '",
+        r"ab(c)?d\.+e{2,3}fgh": "fgh",
+        r"a{bc[]x]y": "a{bc",
+        r"(?x) mutex \ lock  # comment": "mutex lock",
+        r"mutex (lock|unlock)": "mutex ",
+        r"mutex\x20lock": "mutex",
+        r"\u0020\U00000020mutex": "mutex",
+        r"\N{SPACE}bar": "bar",
+        r"abcd\0123ef": "abcd",
+        r"(a)\12345": None,
+        r"mutex lock|mutex unlock": None,
+        r"(?i)mutex lock": None,
+        r"\w+": None,
+    }
+    for pattern, literal in cases.items():
+        assert _required_literal(re.compile(pattern)) == literal, pattern
@@ -1,7 +1,9 @@
 from app.cache import openQACache
 import logging
 import json
+import sqlite3
 import pytest
+import zstandard
 from pathlib import Path
 
 
@@ -36,25 +38,113 @@ def test_get_size(cache):
     # 1. Test empty cache
     assert cache.get_size() == 0
 
-    # 2. Test with a single file
-    file_path = Path(cache._file_path("1"))
-    test_data_1 = "test data"
-    file_path.write_text(test_data_1)
-    assert cache.get_size() == len(test_data_1)
+    # 2. Test with a single entry
+    cache.write_data("1", {"id": 1}, "test data")
+    size_1 = cache._entry_size("1")
+    assert size_1 > 0
+    assert cache.get_size() == size_1
 
-    # 3. Test with multiple files and a subdirectory
-    file_path_2 = Path(cache._file_path("2"))
-    test_data_2 = "more test data"
-    file_path_2.write_text(test_data_2)
+    # 3. Test with multiple entries, from different hostnames
+    cache.write_data("2", {"id": 2}, "more test data")
+    other_cache = openQACache(cache.cache_path, "other_host", None, cache.logger)
+    other_cache.write_data("3", {"id": 3}, "nested data")
 
-    sub_dir = Path(cache.cache_host_dir) / "sub"
-    sub_dir.mkdir()
-    sub_file_path = sub_dir / "3.json"
-    nested_data = "nested data"
-    sub_file_path.write_text(nested_data)
-
-    expected_size = len(test_data_1) + len(test_data_2) + len(nested_data)
+    expected_size = size_1 + cache._entry_size("2") + other_cache._entry_size("3")
     assert cache.get_size() == expected_size
+    assert other_cache.get_size() == expected_size
+
+
+def test_get_size_without_index(tmp_path, logger):
+    """
+    Tests that without the index the size is computed from all the files,
+    in all the hostname directories.
+    """
+    host_dir = tmp_path / "cache" / "test_host"
+    host_dir.mkdir(parents=True)
+    (host_dir / "1.json").write_text("12345")
+    (tmp_path / "cache" / "other_host").mkdir()
+    (tmp_path / "cache" / "other_host" / "2.json").write_text("1234567")
+
+    cache = openQACache(str(tmp_path / "cache"), "test_host", None, logger)
+    cache._index = None
+    index_size = (tmp_path / "cache" / "index.db").stat().st_size
+    assert cache.get_size() == 12 + index_size
+
+
+def test_index_filled_from_existing_files(tmp_path, logger):
+    """
+    Tests that the index of a cache written without it is built from the files.
+    """
+    host_dir = tmp_path / "cache" / "test_host"
+    host_dir.mkdir(parents=True)
+    (host_dir / "1.json").write_text("12345")
+    (host_dir / "1.log.zst").write_text("123")
+    (host_dir / "2.json").write_text("1234567")
+    (host_dir / "notes.txt").write_text("not a cache entry")
+
+    cache = openQACache(str(tmp_path / "cache"), "test_host", None, logger)
+    assert cache.get_size() == 15
+
+
+def test_lru_eviction(tmp_path, logger):
+    """
+    Tests that the least recently used entries are removed when the cache
+    exceeds its maximum size, and never the entries written by the same
+    cache instance, i.e. by the same request.
+    """
+    cache_dir = str(tmp_path / "cache")
+    cache = openQACache(cache_dir, "test_host", 1, logger)
+    for job_id in ["1", "2", "3"]:
+        cache.write_data(job_id, {"id": job_id}, "x" * 1000)
+    entry_size = cache._entry_size("1")
+    # The request is not done with them: all kept, even above the max size
+    assert all(cache.hit(job_id) for job_id in ["1", "2", "3"])
+
+    cache = openQACache(cache_dir, "test_host", 3 * entry_size, logger)
+    # Job 1 is used again: job 2 is now the least recently used
+    assert cache.get_data("1") is not None
+
+    cache.write_data("4", {"id": "4"}, "x" * 1000)
+
+    assert not cache.hit("2")
+    assert not Path(cache._compressed_log_path("2")).exists()
+    assert all(cache.hit(job_id) for job_id in ["1", "3", "4"])
+    assert cache.get_size() == 3 * entry_size
+
+    # An entry bigger than the whole cache is kept, all the others removed
+    cache = openQACache(cache_dir, "test_host", 1, logger)
+    cache.write_data("5", {"id": "5"}, "x" * 1000)
+    assert [cache.hit(job_id) for job_id in ["1", "3", "4", "5"]] == [
+        False,
+        False,
+        False,
+        True,
+    ]
+
+
+def test_access_times_written_at_close(tmp_path, logger):
+    """
+    Tests that reading cache entries only updates their access time in the
+    index once the cache is closed.
+    """
+    cache_dir = str(tmp_path / "cache")
+    cache = openQACache(cache_dir, "test_host", None, logger)
+    cache.write_data("1", {"id": "1"}, "some log content")
+    cache.close()
+    index = sqlite3.connect(str(tmp_path / "cache" / "index.db"))
+    query = "SELECT atime FROM entries WHERE job_id = '1'"
+    atime = index.execute(query).fetchone()[0]
+
+    cache = openQACache(cache_dir, "test_host", None, logger)
+    assert cache.get_data("1") is not None
+    assert cache.get_log_content("1") == ("some log content", True)
+    assert index.execute(query).fetchone()[0] == atime
+
+    cache.close()
+    assert index.execute(query).fetchone()[0] > atime
+    # Still usable once closed
+    assert cache.get_data("1") is not None
+    index.close()
 
 
 def test_hit(cache):
@@ -143,3 +233,95 @@ def test_get_log_content_invalid_json(cache):
     content, hit = cache.get_log_content(job_id)
     assert content is None
     assert hit is False
+
+
+def test_write_data_round_trip(cache):
+    """
+    Tests that the data written by write_data is read back by get_data
+    and get_log_content, from two separate files.
+    """
+    job_id = "101"
+    job_details = {"id": 101, "name": "test_job"}
+    log_content = "[2025-09-01T10:00:00.000Z] [debug] héllo\r\n"
+    cache.write_data(job_id, job_details, log_content)
+
+    assert cache.hit(job_id)
+    compressed_log = Path(cache._compressed_log_path(job_id)).read_bytes()
+    assert zstandard.ZstdDecompressor().decompress(compressed_log) == (
+        log_content.encode("utf-8")
+    )
+    assert not Path(cache.log_path(job_id)).exists()
+    assert "log_content" not in json.loads(Path(cache._file_path(job_id)).read_text())
+    assert cache.get_data(job_id) == {"id": 101, "name": "test_job", "is_cached": True}
+    assert cache.get_log_content(job_id) == (log_content, True)
+
+
+def test_write_data_log_already_downloaded(cache):
+    """
+    Tests that write_data completes a cache entry whose log file has
+    already been downloaded to log_path().
+    """
+    job_id = "102"
+    Path(cache.log_path(job_id)).write_text("downloaded log")
+    assert not cache.hit(job_id)
+    # A log file is only created once complete: it can already be used
+    assert cache.get_log_content(job_id) == ("downloaded log", True)
+
+    cache.write_data(job_id, {"id": 102})
+
+    assert cache.hit(job_id)
+    # The downloaded log has been replaced by its compressed version
+    assert sorted(p.name for p in Path(cache.cache_host_dir).iterdir()) == [
+        "102.json",
+        "102.log.zst",
+    ]
+    assert cache.get_log_content(job_id) == ("downloaded log", True)
+    assert cache.read_log(job_id) == "downloaded log"
+    assert cache.read_log("non_existent_job") is None
+
+
+def test_open_for_replace(cache):
+    """
+    Tests that a cache file is only created once completely written,
+    and that no temporary file is left behind on failure.
+    """
+    path = Path(cache.log_path("104"))
+    with pytest.raises(RuntimeError), cache._open_for_replace(str(path)) as f:
+        f.write(b"partial")
+        raise RuntimeError("write failed")
+    assert list(Path(cache.cache_host_dir).iterdir()) == []
+
+    with cache._open_for_replace(str(path)) as f:
+        f.write(b"complete")
+        assert not path.exists()
+    assert path.read_bytes() == b"complete"
+    assert list(Path(cache.cache_host_dir).iterdir()) == [path]
+
+
+def test_get_log_content_uncompressed(cache):
+    """
+    Tests that a log file stored without compression is still read.
+    """
+    job_id = "103"
+    Path(cache.log_path(job_id)).write_bytes(b"plain log\r\n")
+    Path(cache._file_path(job_id)).write_text(json.dumps({"job_details": {}}))
+
+    assert cache.get_log_content(job_id) == ("plain log\r\n", True)
+
+
+def test_parsed_log_round_trip(cache):
+    """
+    Tests that a parsed log is only returned for the parser key it was
+    written with, and that it counts in the cache entry size.
+    """
+    job_id = "17"
+    parsed_log = {"autoinst-log": [{"message": "hello"}], "parser_name": "p1"}
+    assert cache.get_parsed_log(job_id, "key1") is None
+
+    cache.write_data(job_id, {"id": 17}, "some log content")
+    size = cache.get_size()
+    cache.write_parsed_log(job_id, "key1", parsed_log)
+
+    assert cache.get_parsed_log(job_id, "key1") == parsed_log
+    assert cache.get_parsed_log(job_id, "key2") is None
+    assert cache.get_size() > size
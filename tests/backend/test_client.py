@@ -36,6 +36,35 @@ def test_client_initialization_success(mock_openqa_client, app_logger):
     _ = wrapper.client
     # Check that SSL verification is disabled on the mocked instance
     assert mock_openqa_client.session.verify is False
+    # Check that a connection pool is mounted for both schemes, and one
+    # retrying on gateway errors for the log downloads only
+    mounted = {
+        c.args[0]: c.args[1].max_retries
+        for c in mock_openqa_client.session.mount.call_args_list
+    }
+    assert list(mounted) == ["https://", "http://", "https://openqa.suse.de/tests/"]
+    assert mounted["https://"].total == 0
+    retry = mounted["https://openqa.suse.de/tests/"]
+    assert 503 in retry.status_forcelist
+    assert retry.connect == 0 and retry.read == 0
+    assert retry.raise_on_status is False
+
+
+def test_client_initialization_job_id_in_longer_path(mock_openqa_client, app_logger):
+    """Tests the job ID extraction from URLs pointing inside a job page."""
+    wrapper = OpenQAClientWrapper(
+        "https://openqa.suse.de/tests/123/file/autoinst-log.txt?x=1#step",
+        app_logger,
+    )
+    assert wrapper.job_id == "123"
+    # Only the leading digits, after the first '/tests/' followed by any
+    for path, job_id in [
+        ("tests/123abc", "123"),
+        ("group/tests/overview/tests/456/", "456"),
+        ("tests/7/tests/8", "7"),
+    ]:
+        wrapper = OpenQAClientWrapper(f"https://openqa.suse.de/{path}", app_logger)
+        assert wrapper.job_id == job_id
 
 
 def test_client_lazy_initialization_is_only_done_once(
@@ -58,6 +87,7 @@ def test_client_lazy_initialization_is_only_done_once(
         ("http://invalid-url", "Could not find job ID in the URL."),
         ("https://no-job-id.com/path", "Could not find job ID in the URL."),
         ("invalid-url-no-scheme", "Invalid URL provided. Could not parse hostname."),
+        ("https://openqa.suse.de/tests/overview", "Could not find job ID in the URL."),
     ],
 )
 def test_client_initialization_failure(mock_openqa_client, app_logger, url, error_msg):
@@ -99,6 +129,23 @@ def test_get_job_details_api_error(mock_openqa_client, app_logger):
         wrapper.get_job_details("123")
 
 
+def test_get_job_details_many(mock_openqa_client, app_logger):
+    """Tests fetching multiple jobs, an error on one does not stop the others."""
+
+    def openqa_request(method, path):
+        if path == "jobs/2":
+            return {}
+        return {"job": {"id": int(path.split("/")[1])}}
+
+    mock_openqa_client.openqa_request.side_effect = openqa_request
+    wrapper = OpenQAClientWrapper("https://openqa.suse.de/tests/1", app_logger)
+    results = wrapper.get_job_details_many(["1", "2", "3"])
+    assert list(results.keys()) == ["1", "2", "3"]
+    assert results["1"] == {"id": 1}
+    assert isinstance(results["2"], OpenQAClientAPIError)
+    assert results["3"] == {"id": 3}
+
+
 def test_get_log_content_success(mock_openqa_client, app_logger):
     """Tests successful download of log content."""
     mock_response = MagicMock()
@@ -124,3 +171,66 @@ def test_get_log_content_http_error(mock_openqa_client, app_logger):
         match="Failed to download log autoinst-log.txt for job 123: HTTP Error",
     ):
         wrapper.get_log_content("123", "autoinst-log.txt")
+
+
+def test_get_log_content_to_file(mock_openqa_client, app_logger, tmp_path):
+    """Tests streaming a log file to disk."""
+    mock_response = MagicMock()
+    mock_response.iter_content.return_value = [b"log ", b"content"]
+    mock_openqa_client.session.get.return_value.__enter__.return_value = mock_response
+    wrapper = OpenQAClientWrapper("https://openqa.suse.de/tests/123", app_logger)
+    out_path = tmp_path / "123.log"
+    size = wrapper.get_log_content_to_file("123", "autoinst-log.txt", str(out_path))
+    assert size == 11
+    assert out_path.read_bytes() == b"log content"
+    assert list(tmp_path.iterdir()) == [out_path]
+    mock_openqa_client.session.get.assert_called_once_with(
+        "https://openqa.suse.de/tests/123/file/autoinst-log.txt",
+        stream=True,
+        timeout=60,
+    )
+
+
+def test_get_log_content_to_file_concurrent(mock_openqa_client, app_logger, tmp_path):
+    """
+    Tests that two downloads of the same log at the same time do not write
+    to the same temporary file.
+    """
+    wrapper = OpenQAClientWrapper("https://openqa.suse.de/tests/123", app_logger)
+    out_path = tmp_path / "123.log"
+
+    def first_chunks(chunk_size):
+        yield b"first "
+        # Another download of the same log completes in the meantime
+        wrapper.get_log_content_to_file("123", "autoinst-log.txt", str(out_path))
+        assert out_path.read_bytes() == b"second download"
+        yield b"download"
+
+    first = MagicMock()
+    first.iter_content.side_effect = first_chunks
+    second = MagicMock()
+    second.iter_content.return_value = [b"second ", b"download"]
+    mock_openqa_client.session.get.return_value.__enter__.side_effect = [
+        first,
+        second,
+    ]
+
+    size = wrapper.get_log_content_to_file("123", "autoinst-log.txt", str(out_path))
+    assert size == 14
+    assert out_path.read_bytes() == b"first download"
+    assert list(tmp_path.iterdir()) == [out_path]
+
+
+def test_get_log_content_to_file_http_error(mock_openqa_client, app_logger, tmp_path):
+    """Tests that a failed download leaves no file behind."""
+    mock_response = MagicMock()
+    mock_response.raise_for_status.side_effect = requests.exceptions.HTTPError(
+        "404 Not Found"
+    )
+    mock_openqa_client.session.get.return_value.__enter__.return_value = mock_response
+    wrapper = OpenQAClientWrapper("https://openqa.suse.de/tests/123", app_logger)
+    with pytest.raises(OpenQAClientLogDownloadError, match="404 Not Found"):
+        wrapper.get_log_content_to_file(
+            "123", "autoinst-log.txt", str(tmp_path / "123.log")
+        )
+    assert list(tmp_path.iterdir()) == []
@@ -1,6 +1,9 @@
+import os
 import pytest
 import yaml
+from unittest.mock import patch
 from app import load_configuration
+from app.autoinst_parser import parse_autoinst_log
 
 
 def test_load_configuration_success(tmp_path, app_logger, monkeypatch):
@@ -29,10 +32,74 @@ def test_load_configuration_success(tmp_path, app_logger, monkeypatch):
     # Check that regexes have been compiled
     assert hasattr(parsers[0]["match_name"], "search")
     assert hasattr(parsers[0]["channels"][0]["pattern"], "search")
+    assert hasattr(parsers[0]["channel_matcher"], "match")
+    assert len(parsers[0]["cache_key"]) == 64
 
     assert max_jobs == 20
 
 
+def test_load_configuration_cache_key(tmp_path, app_logger, monkeypatch):
+    """
+    Tests that parsers with the same channels but different names do not
+    share the key of their parsed logs in the cache.
+    """
+    parser = {
+        "match_name": ".*(?P<name>test).*",
+        "channels": [{"name": "test_channel", "pattern": "hello", "type": "test"}],
+    }
+    config_content = {
+        "autoinst_parser": [{"name": "p1", **parser}, {"name": "p2", **parser}]
+    }
+    config_file = tmp_path / "config.yaml"
+    config_file.write_text(yaml.dump(config_content))
+    monkeypatch.setenv("OQTV_CONFIG_FILE", str(config_file))
+    _, _, parsers, _, _, _ = load_configuration(app_logger)
+
+    assert parsers[0]["cache_key"] != parsers[1]["cache_key"]
+
+
+def test_load_configuration_crlf_log(tmp_path, app_logger, monkeypatch):
+    """
+    Tests that the configured regexes parse logs with CRLF line breaks,
+    the '\\r' not preventing '$' anchored channel patterns to match.
+    """
+    config_content = {
+        "autoinst_parser": [
+            {
+                "name": "test_parser",
+                "match_name": ".*(?P<name>test).*",
+                "channels": [
+                    {
+                        "name": "test_channel",
+                        "pattern": "hello (?P<who>\\w+)$",
+                        "type": "test",
+                    }
+                ],
+            }
+        ],
+    }
+    config_file = tmp_path / "config.yaml"
+    config_file.write_text(yaml.dump(config_content))
+    monkeypatch.setenv("OQTV_CONFIG_FILE", str(config_file))
+    _, _, parsers, timestamp_re, perl_exception_re, _ = load_configuration(app_logger)
+
+    log_content = (
+        "[2025-09-01T10:00:00.000Z] [debug] hello world\r\n"
+        "[2025-09-01T10:00:01.000Z] [debug] hello again\r\n"
+    )
+    parsed_log, _, line_count, match_count = parse_autoinst_log(
+        log_content,
+        parsers[0]["channels"],
+        timestamp_re,
+        perl_exception_re,
+        parsers[0]["channel_matcher"],
+    )
+    assert line_count == 2
+    assert match_count == 2
+    assert [entry["who"] for entry in parsed_log] == ["world", "again"]
+    assert parsed_log[0]["message"] == "[debug] hello world"
+
+
 def test_load_configuration_invalid_regex(tmp_path, app_logger, monkeypatch):
     """Tests that the application exits if an invalid regex is in the config."""
     config_content = {
@@ -229,3 +296,66 @@ def test_load_configuration_no_cache(tmp_path, app_logger, monkeypatch):
 
     assert CACHE_DIR == "./.cache"
     assert CACHE_MAX_SIZE is None
+
+
+def test_load_configuration_sidecar(tmp_path, app_logger, monkeypatch):
+    """
+    Tests that the parsed configuration is stored in a sidecar file and
+    reused on the next load as long as the configuration file is unchanged.
+    """
+    config_content = {
+        "max_jobs_to_explore": 5,
+        "autoinst_parser": [
+            {
+                "name": "test_parser",
+                "match_name": ".*(?P<name>test).*",
+                "channels": [
+                    {"name": "test_channel", "pattern": ".*hello.*", "type": "test"}
+                ],
+            }
+        ],
+    }
+    config_file = tmp_path / "config.yaml"
+    config_file.write_text(yaml.dump(config_content))
+    monkeypatch.setenv("OQTV_CONFIG_FILE", str(config_file))
+
+    load_configuration(app_logger)
+    assert (tmp_path / "__pycache__" / "config.yaml.json").exists()
+
+    # Second load is served by the sidecar, YAML is not parsed again.
+    with patch("app.yaml.load") as mock_yaml_load:
+        _, _, parsers, _, _, max_jobs = load_configuration(app_logger)
+        mock_yaml_load.assert_not_called()
+    assert max_jobs == 5
+    assert parsers[0]["name"] == "test_parser"
+    assert hasattr(parsers[0]["match_name"], "search")
+    assert hasattr(parsers[0]["channels"][0]["pattern"], "search")
+
+    # A modified configuration file invalidates the sidecar.
+    config_content["max_jobs_to_explore"] = 50
+    config_file.write_text(yaml.dump(config_content))
+    _, _, _, _, _, max_jobs = load_configuration(app_logger)
+    assert max_jobs == 50
+
+    # Even when replaced by one with the same size and modification time.
+    config_stat = config_file.stat()
+    config_content["max_jobs_to_explore"] = 60
+    config_file.write_text(yaml.dump(config_content))
+    os.utime(config_file, ns=(config_stat.st_atime_ns, config_stat.st_mtime_ns))
+    assert config_file.stat().st_size == config_stat.st_size
+    _, _, _, _, _, max_jobs = load_configuration(app_logger)
+    assert max_jobs == 60
+
+
+def test_load_configuration_sidecar_not_json(tmp_path, app_logger, monkeypatch):
+    """
+    Tests that a configuration that JSON cannot represent as is, here with
+    a date or an integer mapping key, is not stored in a sidecar file.
+    """
+    config_file = tmp_path / "config.yaml"
+    monkeypatch.setenv("OQTV_CONFIG_FILE", str(config_file))
+    for extra in ["released: 2025-09-01", "1: one"]:
+        config_file.write_text(f"max_jobs_to_explore: 5\n{extra}\n")
+        _, _, _, _, _, max_jobs = load_configuration(app_logger)
+        assert max_jobs == 5
+        assert not (tmp_path / "__pycache__" / "config.yaml.json").exists()
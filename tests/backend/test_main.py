@@ -1,7 +1,16 @@
+import logging
 import re
-from unittest.mock import MagicMock, patch
+from unittest.mock import MagicMock, call, patch
 import pytest
-from app.main import find_event_pairs, create_timeline_events, format_job_name, app
+from app.main import (
+    find_event_pairs,
+    create_timeline_events,
+    discover_jobs,
+    format_job_name,
+    process_job_logs,
+    app,
+)
+from app.client import OpenQAClientAPIError, OpenQAClientLogDownloadError
 
 
 @pytest.fixture
@@ -11,6 +20,15 @@ def client():
         yield client
 
 
+@pytest.fixture
+def null_logger():
+    """A real logger dropping all records, for tests not checking the logs."""
+    logger = logging.getLogger("tests.null")
+    logger.handlers = [logging.NullHandler()]
+    logger.propagate = False
+    return logger
+
+
 def test_format_job_name(monkeypatch):
     """Tests that job names are formatted correctly based on parser regex."""
     # Mock the app's logger to check for the warning
@@ -33,8 +51,7 @@ def test_format_job_name(monkeypatch):
     assert format_job_name("") == "Unknown Name"
 
 
-def test_find_event_pairs_mutex_unmatched():
-    mock_logger = MagicMock()
+def test_find_event_pairs_mutex_unmatched(null_logger):
     """Tests the logic for finding create/unlock and unmatched events."""
     timeline_events = [
         {
@@ -75,7 +92,7 @@ def test_find_event_pairs_mutex_unmatched():
         },
     ]
 
-    all_pairs, count = find_event_pairs(timeline_events, mock_logger)
+    all_pairs, count = find_event_pairs(timeline_events, null_logger)
 
     assert count == 6
     # Should find 2 create/unlock pairs and 0 lock/unlock pairs
@@ -94,8 +111,7 @@ def test_find_event_pairs_mutex_unmatched():
     assert all_pairs[1]["pair_type"] == "mutex_create_unlock"
 
 
-def test_find_event_pairs_mutex_create_one_to_many():
-    mock_logger = MagicMock()
+def test_find_event_pairs_mutex_create_one_to_many(null_logger):
     """
     Tests that multiple unlock events are paired with the single most recent create event.
     """
@@ -125,7 +141,7 @@ def test_find_event_pairs_mutex_create_one_to_many():
             "type": "mutex",
         },
     ]
-    all_pairs, _ = find_event_pairs(timeline_events, mock_logger)
+    all_pairs, _ = find_event_pairs(timeline_events, null_logger)
     # Should find 2 create/unlock pairs and 0 lock/unlock pairs
     assert len(all_pairs) == 2
     # Both unlocks pair with the most recent create event (at timestamp "2")
@@ -135,8 +151,7 @@ def test_find_event_pairs_mutex_create_one_to_many():
     assert all_pairs[1]["end_event"]["timestamp"] == "4"
 
 
-def test_find_event_pairs_mutex_lock_nested():
-    mock_logger = MagicMock()
+def test_find_event_pairs_mutex_lock_nested(null_logger):
     """Tests correct pairing of nested lock/unlock events."""
     timeline_events = [
         {
@@ -164,7 +179,7 @@ def test_find_event_pairs_mutex_lock_nested():
             "type": "mutex",
         },
     ]
-    all_pairs, _ = find_event_pairs(timeline_events, mock_logger)
+    all_pairs, _ = find_event_pairs(timeline_events, null_logger)
     # Should find 0 create/unlock pairs and 2 lock/unlock pairs
     assert len(all_pairs) == 2
     # Inner pair (LIFO)
@@ -177,8 +192,7 @@ def test_find_event_pairs_mutex_lock_nested():
     assert all_pairs[1]["pair_type"] == "mutex_lock_unlock"
 
 
-def test_find_event_pairs_barrier_one_to_many():
-    mock_logger = MagicMock()
+def test_find_event_pairs_barrier_one_to_many(null_logger):
     """Tests that multiple barrier_wait events are paired with one barrier_create."""
     timeline_events = [
         {
@@ -200,7 +214,7 @@ def test_find_event_pairs_barrier_one_to_many():
             "type": "barrier",
         },
     ]
-    all_pairs, count = find_event_pairs(timeline_events, mock_logger)
+    all_pairs, count = find_event_pairs(timeline_events, null_logger)
 
     assert count == 3
     assert len(all_pairs) == 2
@@ -218,9 +232,8 @@ def test_find_event_pairs_barrier_one_to_many():
     assert all_pairs[1]["pair_type"] == "barrier_create_wait"
 
 
-def test_find_event_pairs_ignores_events_without_name():
+def test_find_event_pairs_ignores_events_without_name(null_logger):
     """Tests that events without a mutex/barrier name are ignored."""
-    mock_logger = MagicMock()
     timeline_events = [
         {
             "timestamp": "1",
@@ -233,7 +246,7 @@ def test_find_event_pairs_ignores_events_without_name():
             "type": "barrier",
         },  # No barrier name
     ]
-    all_pairs, count = find_event_pairs(timeline_events, mock_logger)
+    all_pairs, count = find_event_pairs(timeline_events, null_logger)
 
     assert len(all_pairs) == 0
     assert count == 0
@@ -275,6 +288,155 @@ def test_create_timeline_events():
     assert timeline[2]["log_index"] == 0
 
 
+def test_discover_jobs_fetches_related_jobs_together():
+    """
+    Tests that the parallel jobs not in the cache are fetched with a single
+    get_job_details_many call, and that API errors are reported per job.
+    """
+    jobs = {
+        "1": {"id": 1, "name": "a", "children": {"Parallel": [2, 3, 4]}},
+        "2": {"id": 2, "name": "b", "parents": {"Parallel": [1]}},
+        "4": {"id": 4, "name": "d", "parents": {"Parallel": [1]}},
+    }
+    mock_client = MagicMock()
+    mock_client.get_job_details_many.side_effect = lambda job_ids: {
+        job_id: jobs.get(job_id, OpenQAClientAPIError(f"error {job_id}"))
+        for job_id in job_ids
+    }
+    mock_cache = MagicMock()
+    mock_cache.get_data.side_effect = lambda job_id: (
+        jobs[job_id] if job_id == "2" else None
+    )
+    debug_log = []
+
+    all_job_details, perf = discover_jobs(
+        mock_client, mock_cache, "1", False, debug_log, 10
+    )
+
+    assert list(all_job_details.keys()) == ["1", "2", "3", "4"]
+    assert all_job_details["3"] == {"error": "error 3"}
+    assert mock_client.get_job_details_many.call_args_list == [
+        call(["1"]),
+        call(["3", "4"]),
+    ]
+    assert perf["cache_hits"] == 1
+    assert [call["job_id"] for call in perf["api_calls"]] == ["1", "4"]
+
+
+def test_process_job_logs_downloads_missing_logs_together():
+    """
+    Tests that the logs missing from the cache are all downloaded, a failed
+    download not preventing the others, and that the debug log keeps the
+    job order.
+    """
+    all_job_details = {
+        "1": {"id": 1, "name": "job1", "state": "done"},
+        "2": {"id": 2, "name": "job2", "state": "done"},
+        "3": {"id": 3, "name": "job3", "state": "done"},
+        "4": {"id": 4, "name": "job4", "state": "running"},
+    }
+    mock_client = MagicMock()
+
+    def get_log_content_to_file(job_id, filename, out_path):
+        if job_id == "2":
+            raise OpenQAClientLogDownloadError("Failed to download log for job 2")
+        return 10
+
+    mock_client.get_log_content_to_file.side_effect = get_log_content_to_file
+    mock_cache = MagicMock()
+    mock_cache.get_log_content.return_value = (None, False)
+    mock_cache.read_log.return_value = "some log content"
+    debug_log = []
+
+    with patch("app.main._parse_log_content") as mock_parse:
+        _, perf = process_job_logs(mock_client, mock_cache, all_job_details, debug_log)
+
+    assert mock_client.get_log_content_to_file.call_count == 3
+    assert [d["job_id"] for d in perf["log_downloads"]] == ["1", "3"]
+    assert [c.args[2] for c in mock_parse.call_args_list] == ["1", "3"]
+    assert debug_log == [
+        {"level": "info", "message": "Cached data for job 1."},
+        {"level": "error", "message": "Failed to download log for job 2"},
+        {"level": "info", "message": "Cached data for job 3."},
+    ]
+    assert all_job_details["2"]["autoinst-log"].startswith("ERROR:")
+    assert all_job_details["4"]["autoinst-log"].startswith("INFO:")
+
+
+def test_process_job_logs_downloaded_log_missing():
+    """
+    Tests that a downloaded log that cannot be read back from the cache
+    is reported as an error instead of being silently skipped.
+    """
+    all_job_details = {"1": {"id": 1, "name": "job1", "state": "done"}}
+    mock_client = MagicMock()
+    mock_client.get_log_content_to_file.return_value = 10
+    mock_cache = MagicMock()
+    mock_cache.get_log_content.return_value = (None, False)
+    mock_cache.read_log.return_value = None
+    debug_log = []
+
+    with patch("app.main._parse_log_content") as mock_parse:
+        process_job_logs(mock_client, mock_cache, all_job_details, debug_log)
+
+    mock_parse.assert_not_called()
+    error_msg = "Failed to read the downloaded log of job 1 from the cache."
+    assert debug_log[-1] == {"level": "error", "message": error_msg}
+    assert all_job_details["1"]["autoinst-log"] == f"ERROR: {error_msg}"
+
+
+def test_process_job_logs_parsed_log_cached(monkeypatch):
+    """
+    Tests that a log already parsed with the same parser configuration is
+    not read nor parsed again, and that a new parsing result is cached.
+    """
+    monkeypatch.setattr(
+        "app.main.autoinst_log_parsers",
+        [
+            {
+                "name": "p1",
+                "match_name": re.compile(r"(?P<name>job)"),
+                "channels": [
+                    {
+                        "name": "mutex_create",
+                        "type": "mutex",
+                        "pattern": re.compile(r"mutex create"),
+                    }
+                ],
+                "cache_key": "key1",
+            }
+        ],
+    )
+    all_job_details = {
+        "1": {"id": 1, "name": "job1", "state": "done"},
+        "2": {"id": 2, "name": "job2", "state": "done"},
+    }
+    parsed_log = {
+        "autoinst-log": [{"message": "cached"}],
+        "optional_columns": [],
+        "parser_name": "p1",
+    }
+    mock_cache = MagicMock()
+    mock_cache.get_parsed_log.side_effect = lambda job_id, key: (
+        parsed_log if job_id == "1" else None
+    )
+    mock_cache.get_log_content.return_value = (
+        "[2025-09-01T10:00:00.000Z] [debug] mutex create 'm1'\n",
+        True,
+    )
+
+    _, perf = process_job_logs(MagicMock(), mock_cache, all_job_details, [])
+
+    assert perf["cache_hits"] == 2
+    assert all_job_details["1"]["autoinst-log"] == [{"message": "cached"}]
+    mock_cache.get_log_content.assert_called_once_with("2")
+    assert [p["job_id"] for p in perf["log_parsing"]] == ["2"]
+    job_id, key, written = mock_cache.write_parsed_log.call_args.args
+    assert (job_id, key) == ("2", "key1")
+    assert written["parser_name"] == "p1"
+    assert written["autoinst-log"] == all_job_details["2"]["autoinst-log"]
+
+
 def test_analyze_cache_write(client):
     """
     Tests that cache.write_data is called on a cache miss for the log file.
@@ -290,8 +452,10 @@ def test_analyze_cache_write(client):
 
     with patch("app.main.OpenQAClientWrapper") as MockClient:
         mock_client_instance = MockClient.return_value
-        mock_client_instance.get_job_details.return_value = mock_job_details
-        mock_client_instance.get_log_content.return_value = mock_log_content
+        mock_client_instance.get_job_details_many.return_value = {"1": mock_job_details}
+        mock_client_instance.get_log_content_to_file.return_value = len(
+            mock_log_content
+        )
         mock_client_instance.hostname = "fake_host"
         mock_client_instance.job_id = "1"
         mock_client_instance.get_job_url.return_value = "http://fake/t1"
@@ -302,17 +466,63 @@ def test_analyze_cache_write(client):
             mock_cache_instance.hit.return_value = False
             mock_cache_instance.get_data.return_value = None
             mock_cache_instance.get_log_content.return_value = (None, False)
+            mock_cache_instance.log_path.return_value = "/fake/cache/1.log"
+            mock_cache_instance.read_log.return_value = mock_log_content
 
             # Make the call to the endpoint
             response = client.post("/analyze", json={"log_url": "http://fake/tests/1"})
 
             # Assertions
             assert response.status_code == 200
-            # Check that get_job_details was called
-            mock_client_instance.get_job_details.assert_called_once_with("1")
-            # Check that get_log_content was called because of the cache miss
-            mock_client_instance.get_log_content.assert_called_once_with("1", "autoinst-log.txt")
+            assert response.is_json
+            assert response.json["jobs"]["1"]["name"] == "fake_job"
+            # Check that the job details were fetched
+            mock_client_instance.get_job_details_many.assert_called_once_with(["1"])
+            # Check that the log was downloaded to the cache because of the cache miss
+            mock_client_instance.get_log_content_to_file.assert_called_once_with(
+                "1", "autoinst-log.txt", "/fake/cache/1.log"
+            )
             # The main assertion: check that write_data was called correctly
             mock_cache_instance.write_data.assert_called_once_with(
-                "1", mock_job_details, mock_log_content
-            )
\ No newline at end of file
+                "1", mock_job_details
+            )
+            # The downloaded log is then parsed
+            mock_cache_instance.read_log.assert_called_once_with("1")
+            # The cache index is closed at the end of the request
+            mock_cache_instance.close.assert_called_once_with()
+
+
+def test_analyze_without_logs(client):
+    """
+    Tests that with include_logs set to false only the job details are
+    returned, without reading or downloading any log.
+    """
+    mock_job_details = {
+        "id": "1",
+        "name": "fake_job",
+        "state": "done",
+        "children": {},
+        "parents": {},
+    }
+
+    with patch("app.main.OpenQAClientWrapper") as MockClient:
+        mock_client_instance = MockClient.return_value
+        mock_client_instance.hostname = "fake_host"
+        mock_client_instance.job_id = "1"
+        mock_client_instance.get_job_url.return_value = "http://fake/t1"
+
+        with patch("app.main.openQACache") as MockCache:
+            mock_cache_instance = MockCache.return_value
+            mock_cache_instance.get_data.return_value = mock_job_details
+
+            response = client.post(
+                "/analyze",
+                json={"log_url": "http://fake/tests/1", "include_logs": False},
+            )
+
+            assert response.status_code == 200
+            assert response.json["jobs"]["1"]["name"] == "fake_job"
+            assert response.json["timeline_events"] == []
+            mock_client_instance.get_job_details_many.assert_not_called()
+            mock_cache_instance.get_log_content.assert_not_called()
+            mock_client_instance.get_log_content_to_file.assert_not_called()